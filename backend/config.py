@@ -1,21 +1,37 @@
 """Application configuration settings."""
-from pathlib import Path
-from pydantic_settings import BaseSettings
-from functools import lru_cache
+import os
+import sys
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+from functools import cached_property
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # Calculate project root directory (backend's parent directory)
-_BACKEND_DIR = Path(__file__).resolve().parent
-_PROJECT_ROOT = _BACKEND_DIR.parent
+# abspath avoids Path.resolve()'s stat/readlink chain at import time;
+# symlink canonicalization is not needed here.
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+_PROJECT_ROOT = os.path.dirname(_BACKEND_DIR)
+
+# Load .env into os.environ once at import. Settings then reads the
+# already-populated environment instead of re-opening and re-parsing the
+# file on every Settings() construction.
+load_dotenv(".env", override=False)
 
 # Model ID mapping: Anthropic API model ID -> AWS Bedrock model ID
 # Used when CLAUDE_CODE_USE_BEDROCK=true
-ANTHROPIC_TO_BEDROCK_MODEL_MAP: dict[str, str] = {
-    # Claude 4.5 models
-    "claude-haiku-4-5-20251001": "global.anthropic.claude-haiku-4-5-20251001-v1:0",
-    "claude-sonnet-4-5-20250929": "global.anthropic.claude-sonnet-4-5-20250929-v1:0",
-    "claude-opus-4-5-20251101": "global.anthropic.claude-opus-4-5-20251101-v1:0",
-}
-
+# Frozen as a MappingProxyType to signal immutability; mutating it would bypass
+# the bound-method lookup below. Keys are interned so dict probes against
+# interned inputs compare by pointer identity instead of full string equality.
+ANTHROPIC_TO_BEDROCK_MODEL_MAP: Mapping[str, str] = MappingProxyType({
+    sys.intern(anthropic_id): bedrock_id
+    for anthropic_id, bedrock_id in {
+        # Claude 4.5 models
+        "claude-haiku-4-5-20251001": "global.anthropic.claude-haiku-4-5-20251001-v1:0",
+        "claude-sonnet-4-5-20250929": "global.anthropic.claude-sonnet-4-5-20250929-v1:0",
+        "claude-opus-4-5-20251101": "global.anthropic.claude-opus-4-5-20251101-v1:0",
+    }.items()
+})
 
 def get_bedrock_model_id(anthropic_model_id: str) -> str:
     """Convert Anthropic model ID to AWS Bedrock model ID.
@@ -26,7 +42,55 @@ def get_bedrock_model_id(anthropic_model_id: str) -> str:
     Returns:
         The corresponding AWS Bedrock model identifier, or the original ID if no mapping exists
     """
-    return ANTHROPIC_TO_BEDROCK_MODEL_MAP.get(anthropic_model_id, anthropic_model_id)
+    # With only three known IDs, match/case beats a dict probe: the literal
+    # patterns are interned at compile time so matching is a handful of
+    # pointer-equality checks with no hashing of the key. Keep the literals
+    # in sync with ANTHROPIC_TO_BEDROCK_MODEL_MAP above.
+    match sys.intern(anthropic_model_id):
+        case "claude-haiku-4-5-20251001":
+            return "global.anthropic.claude-haiku-4-5-20251001-v1:0"
+        case "claude-sonnet-4-5-20250929":
+            return "global.anthropic.claude-sonnet-4-5-20250929-v1:0"
+        case "claude-opus-4-5-20251101":
+            return "global.anthropic.claude-opus-4-5-20251101-v1:0"
+        case _:
+            return anthropic_model_id
+
+
+# Guard against the match/case literals drifting from the mapping.
+assert all(
+    get_bedrock_model_id(k) == v for k, v in ANTHROPIC_TO_BEDROCK_MODEL_MAP.items()
+), "get_bedrock_model_id is out of sync with ANTHROPIC_TO_BEDROCK_MODEL_MAP"
+
+# Reverse mapping, materialized once so Bedrock -> Anthropic lookups (e.g. for
+# logging or display) never have to scan the forward map's items.
+BEDROCK_TO_ANTHROPIC_MODEL_MAP: Mapping[str, str] = MappingProxyType(
+    {v: k for k, v in ANTHROPIC_TO_BEDROCK_MODEL_MAP.items()}
+)
+
+
+def get_anthropic_model_id(bedrock_model_id: str) -> str:
+    """Convert AWS Bedrock model ID back to the Anthropic model ID.
+
+    Args:
+        bedrock_model_id: The AWS Bedrock model identifier
+
+    Returns:
+        The corresponding Anthropic model identifier, or the original ID if no mapping exists
+    """
+    return BEDROCK_TO_ANTHROPIC_MODEL_MAP.get(bedrock_model_id, bedrock_model_id)
+
+
+class DynamoTables(NamedTuple):
+    """DynamoDB table names grouped into one compact, immutable structure."""
+
+    agents: str
+    skills: str
+    mcp: str
+    users: str
+    sessions: str
+    messages: str
+    skill_versions: str
 
 
 class Settings(BaseSettings):
@@ -44,6 +108,12 @@ class Settings(BaseSettings):
     # CORS - include Tauri origins for desktop app
     cors_origins: list[str] = ["http://localhost:5173", "http://localhost:3000", "http://localhost:1420", "tauri://localhost", "https://tauri.localhost", "http://tauri.localhost"]
 
+    @cached_property
+    def cors_origins_set(self) -> frozenset[str]:
+        """CORS origins as a frozenset so origin matching is a hash probe
+        instead of a linear scan of the list."""
+        return frozenset(self.cors_origins)
+
     # Database type: "dynamodb" for cloud deployment, "sqlite" for desktop app
     database_type: str = "dynamodb"
 
@@ -64,6 +134,23 @@ class Settings(BaseSettings):
     dynamodb_messages_table: str = "awesome_skills_platform_messages"
     dynamodb_skill_versions_table: str = "awesome_skills_platform_skill_versions"
 
+    @cached_property
+    def dynamodb_tables(self) -> DynamoTables:
+        """Table names as one NamedTuple.
+
+        Built once so the database layer reads names via a single tuple
+        attribute instead of seven separate pydantic field accesses.
+        """
+        return DynamoTables(
+            agents=self.dynamodb_agents_table,
+            skills=self.dynamodb_skills_table,
+            mcp=self.dynamodb_mcp_table,
+            users=self.dynamodb_users_table,
+            sessions=self.dynamodb_sessions_table,
+            messages=self.dynamodb_messages_table,
+            skill_versions=self.dynamodb_skill_versions_table,
+        )
+
     # JWT Authentication
     jwt_secret_key: str = "your-secret-key-change-in-production"
     jwt_algorithm: str = "HS256"
@@ -87,7 +174,7 @@ class Settings(BaseSettings):
 
     # Agent workspace directory (default: ./workspace relative to project root)
     # This is where main skills are stored in .claude/skills/
-    agent_workspace_dir: str = str(_PROJECT_ROOT / "workspace")
+    agent_workspace_dir: str = os.path.join(_PROJECT_ROOT, "workspace")
 
     # Isolated per-agent workspaces directory (OUTSIDE project tree for skill isolation)
     # Each agent gets its own workspace with absolute symlinks to allowed skills
@@ -101,15 +188,52 @@ class Settings(BaseSettings):
     sandbox_excluded_commands: str = ""  # Comma-separated commands to bypass sandbox (e.g., "git,docker")
     sandbox_allow_unsandboxed: bool = False  # Allow model to bypass sandbox
 
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
+    @cached_property
+    def sandbox_excluded_commands_set(self) -> frozenset[str]:
+        """Excluded commands pre-split into a frozenset.
+
+        Parsed once on first access so callers get O(1) membership checks
+        instead of re-splitting the comma-separated string per bash call.
+        """
+        return frozenset(
+            cmd.strip() for cmd in self.sandbox_excluded_commands.split(",") if cmd.strip()
+        )
+
+    # .env is preloaded into os.environ at module import (load_dotenv above),
+    # so pydantic-settings does not need to parse the file itself. The model
+    # is frozen: settings are read-only after construction, which skips
+    # assignment-validator installation and makes the singleton safe to share.
+    model_config = SettingsConfigDict(
+        frozen=True,
+        validate_assignment=False,
+        # forbid extras so pydantic never allocates a __pydantic_extra__
+        # dict per instance; all fields are declared explicitly above
+        extra="forbid",
+    )
+
+
+# Module-level singleton: settings are built exactly once at import.
+# A plain global avoids lru_cache's per-call lock and key bookkeeping on
+# what is effectively a zero-argument constant lookup.
+_settings: Settings | None = None
 
 
-@lru_cache()
 def get_settings() -> Settings:
-    """Get cached settings instance."""
-    return Settings()
+    """Get the singleton settings instance."""
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
 
 
 settings = get_settings()
+
+# Hot-path constants: these fields are read on every agent invocation, so
+# expose them as plain module globals. A direct import turns pydantic's
+# per-access descriptor walk into a single LOAD_GLOBAL at the call site.
+USE_BEDROCK: bool = settings.claude_code_use_bedrock
+DISABLE_EXPERIMENTAL_BETAS: bool = settings.claude_code_disable_experimental_betas
+DEFAULT_MODEL: str = settings.default_model
+SANDBOX_ENABLED_DEFAULT: bool = settings.sandbox_enabled_default
+SANDBOX_AUTO_ALLOW_BASH: bool = settings.sandbox_auto_allow_bash
+SANDBOX_ALLOW_UNSANDBOXED: bool = settings.sandbox_allow_unsandboxed
@@ -1,14 +1,17 @@
 """Agent lifecycle management using Claude Agent SDK."""
 from typing import AsyncIterator, Optional, Any
+from functools import lru_cache
 from uuid import uuid4
 from datetime import datetime
 from pathlib import Path
+import copy
 import logging
 import os
 import json
 import re
 import hashlib
 import asyncio
+import time
 
 from claude_agent_sdk import (
     ClaudeSDKClient,
@@ -23,44 +26,178 @@ from claude_agent_sdk import (
 )
 
 from database import db
-from config import settings, get_bedrock_model_id
+from config import (
+    settings,
+    get_bedrock_model_id,
+    USE_BEDROCK,
+    DISABLE_EXPERIMENTAL_BETAS,
+    SANDBOX_ENABLED_DEFAULT,
+    SANDBOX_AUTO_ALLOW_BASH,
+    SANDBOX_ALLOW_UNSANDBOXED,
+)
 from .session_manager import session_manager
 from .workspace_manager import workspace_manager
 
 logger = logging.getLogger(__name__)
 
+# Max buffer size for SDK JSON messages (default 10MB to handle large tool
+# outputs). The env var cannot change after process start, so it is read
+# once at import instead of per options build.
+MAX_BUFFER_SIZE = int(os.environ.get("MAX_BUFFER_SIZE", 10 * 1024 * 1024))
+
+# Settings-level sandbox exclusions, pre-sorted once at import; per-agent
+# sandbox config can still override this list per template build.
+_SANDBOX_EXCLUDED_COMMANDS = sorted(settings.sandbox_excluded_commands_set)
+
 # Module-level storage for approved commands per session
-# Key: session_id, Value: set of command hashes that have been approved
-_approved_commands: dict[str, set[str]] = {}
+# Key: session_id, Value: frozenset of command hashes that have been approved.
+# Values are immutable snapshots replaced copy-on-write by approve_command, so
+# readers always see a consistent set and can hold it across awaits without
+# iteration-during-mutation hazards.
+_approved_commands: dict[str, frozenset[str]] = {}
+
+# Shared empty snapshot so approval checks on sessions with no approvals
+# don't allocate.
+_EMPTY_APPROVALS: frozenset[str] = frozenset()
+
+# Compact JSON encoder for hot-path serialization (permission requests,
+# queue payloads): separators without spaces skip the per-call encoder setup
+# and shrink what the DB and SSE layers have to move.
+_json_dumps_compact = json.JSONEncoder(separators=(",", ":")).encode
+
+# Cache for _iso_now: the second-resolution part of the ISO timestamp is
+# formatted once per wall-clock second and only the millisecond suffix is
+# recomputed per call.
+_last_iso_sec: int = -1
+_last_iso_str: str = ""
+
+
+def _iso_now() -> str:
+    """ISO-8601 local timestamp with millisecond precision.
+
+    Equivalent to datetime.now().isoformat(timespec="milliseconds") but
+    amortizes the datetime construction and strftime work across all calls
+    within the same second; bursts (e.g. message persistence during
+    streaming) only pay an integer divmod and a string concat.
+    """
+    global _last_iso_sec, _last_iso_str
+    now_ns = time.time_ns()
+    sec, frac_ns = divmod(now_ns, 1_000_000_000)
+    if sec != _last_iso_sec:
+        _last_iso_str = datetime.fromtimestamp(sec).isoformat()
+        _last_iso_sec = sec
+    return f"{_last_iso_str}.{frac_ns // 1_000_000:03d}"
+
+# Pending permission decisions keyed by request_id. One Future per request
+# carries both the signal and the decision, replacing the old Event +
+# results-dict pair: the waiter awaits the future directly and the timeout
+# is a plain loop.call_later instead of an asyncio.wait_for wrapper task.
+_permission_decisions: dict[str, "asyncio.Future[str]"] = {}
+
+# Sentinel decision used by the timeout handle so the waiter can tell an
+# expired request apart from an explicit deny (expired rows are marked in
+# the database).
+_DECISION_TIMEOUT = "__timeout__"
+
+# Per-session queues for permission requests (each drained only by that
+# session's SSE stream, so routing is O(1) instead of every consumer
+# filtering a shared queue). Bounded so a stalled consumer cannot grow one
+# without limit; producers use put_nowait and deny on overflow instead of
+# parking the hook.
+_permission_request_queues: dict[str, asyncio.Queue] = {}
+
+# In-flight permission requests keyed by (session_key, command_hash) so
+# concurrent identical dangerous commands share one DB row and one user
+# decision instead of each opening their own approval round-trip.
+_inflight_permission_requests: dict[tuple[str, str], "asyncio.Future[dict]"] = {}
+
+
+# Short-TTL cache for _build_options' plugin/MCP/skill resolution. These DB
+# round-trips otherwise run on every conversation turn for data that changes
+# at human timescales. A value may transiently be a Future so concurrent
+# rebuilds of the same agent share a single in-flight fetch.
+_RESOLUTION_CACHE_TTL = 30.0
+_resolution_cache: dict[tuple, tuple[float, Any]] = {}
+
+
+def invalidate_resolution_cache():
+    """Drop cached plugin/MCP/skill resolutions (call after mutating them).
+
+    Also drops the per-agent options templates, which embed the resolved
+    plugin and MCP configs.
+    """
+    _resolution_cache.clear()
+    agent_manager._options_cache.clear()
+
+
+async def _cached_resolution(key: tuple, factory):
+    """Return the cached value for key, computing it at most once concurrently.
+
+    Args:
+        key: Hashable cache key identifying the resolution
+        factory: Zero-argument coroutine function that computes the value
+
+    Returns:
+        The cached or freshly computed value
+    """
+    entry = _resolution_cache.get(key)
+    if entry is not None:
+        expires, value = entry
+        if isinstance(value, asyncio.Future):
+            return await asyncio.shield(value)
+        if expires > time.monotonic():
+            return value
+    future: asyncio.Future = asyncio.get_running_loop().create_future()
+    _resolution_cache[key] = (0.0, future)
+    try:
+        value = await factory()
+    except BaseException as exc:
+        _resolution_cache.pop(key, None)
+        if not future.done():
+            future.set_exception(exc)
+            # Consume the exception if no other task is waiting on the future
+            future.exception()
+        raise
+    _resolution_cache[key] = (time.monotonic() + _RESOLUTION_CACHE_TTL, value)
+    future.set_result(value)
+    return value
+
 
-# Storage for pending permission decisions
-_permission_events: dict[str, asyncio.Event] = {}
-_permission_results: dict[str, str] = {}
+def get_permission_request_queue(session_id: str) -> asyncio.Queue:
+    """Get (or lazily create) the permission request queue for a session."""
+    queue = _permission_request_queues.get(session_id)
+    if queue is None:
+        queue = _permission_request_queues[session_id] = asyncio.Queue(maxsize=64)
+    return queue
 
-# Module-level queue for permission requests (to be picked up by SSE stream)
-_permission_request_queue: asyncio.Queue = asyncio.Queue()
 
+def discard_permission_request_queue(session_id: str):
+    """Drop the permission request queue for a finished session."""
+    _permission_request_queues.pop(session_id, None)
 
+
+@lru_cache(maxsize=4096)
 def _hash_command(command: str) -> str:
-    """Create a hash of the command for approval tracking."""
-    return hashlib.sha256(command.encode()).hexdigest()[:16]
+    """Create a hash of the command for approval tracking.
+
+    BLAKE2b with an 8-byte digest is cheaper than SHA-256 + truncation for
+    these short strings, and the LRU cache means the approve/check pair for
+    the same command only hashes once.
+    """
+    return hashlib.blake2b(command.encode(), digest_size=8).hexdigest()
 
 
 def approve_command(session_id: str, command: str):
-    """Mark a command as approved for a session."""
-    if session_id not in _approved_commands:
-        _approved_commands[session_id] = set()
+    """Mark a command as approved for a session (copy-on-write snapshot)."""
     command_hash = _hash_command(command)
-    _approved_commands[session_id].add(command_hash)
+    old = _approved_commands.get(session_id, _EMPTY_APPROVALS)
+    _approved_commands[session_id] = old | {command_hash}
     logger.info(f"Command approved for session {session_id}: {command[:50]}... (hash: {command_hash})")
 
 
 def is_command_approved(session_id: str, command: str) -> bool:
     """Check if a command was previously approved for a session."""
-    if session_id not in _approved_commands:
-        return False
-    command_hash = _hash_command(command)
-    return command_hash in _approved_commands[session_id]
+    return _hash_command(command) in _approved_commands.get(session_id, _EMPTY_APPROVALS)
 
 
 def clear_session_approvals(session_id: str):
@@ -78,75 +215,103 @@ async def wait_for_permission_decision(request_id: str, timeout: int = 300) -> s
     Returns:
         'approve' or 'deny'
     """
-    event = asyncio.Event()
-    _permission_events[request_id] = event
+    loop = asyncio.get_running_loop()
+    fut: "asyncio.Future[str]" = loop.create_future()
+    _permission_decisions[request_id] = fut
+    timeout_handle = loop.call_later(
+        timeout,
+        lambda: fut.done() or fut.set_result(_DECISION_TIMEOUT),
+    )
 
     try:
-        await asyncio.wait_for(event.wait(), timeout=timeout)
-        return _permission_results.get(request_id, "deny")
-    except asyncio.TimeoutError:
-        # Update database with expired status
-        await db.permission_requests.update(request_id, {"status": "expired"})
-        return "deny"
+        decision = await fut
+        if decision is _DECISION_TIMEOUT:
+            # Update database with expired status
+            await db.permission_requests.update(request_id, {"status": "expired"})
+            return "deny"
+        return decision
     finally:
-        _permission_events.pop(request_id, None)
-        _permission_results.pop(request_id, None)
+        timeout_handle.cancel()
+        _permission_decisions.pop(request_id, None)
 
 
 def set_permission_decision(request_id: str, decision: str):
     """Set the user's permission decision and signal waiting tasks."""
-    _permission_results[request_id] = decision
-    if request_id in _permission_events:
-        _permission_events[request_id].set()
+    fut = _permission_decisions.get(request_id)
+    if fut is not None and not fut.done():
+        fut.set_result(decision)
+
+
+# Memoized env overlay from _configure_claude_environment, keyed on the
+# settings snapshot it was built from. get_api_settings returns the same
+# cached dict object until a settings write invalidates it, so an identity
+# check is enough to know the overlay is still current.
+_claude_env_cache: Optional[tuple[dict, dict[str, str]]] = None
 
 
-async def _configure_claude_environment():
-    """Configure environment variables for Claude Code CLI.
+async def _configure_claude_environment() -> dict[str, str]:
+    """Build the environment overlay for the Claude Code CLI.
 
     Reads API configuration from database settings (Settings page in UI).
     Falls back to environment variables from config.py if no database settings exist.
+
+    Returns a dict handed to ClaudeAgentOptions.env rather than mutating
+    os.environ: setenv takes a process-wide lock, and two concurrently
+    starting agents with different Bedrock credentials would race through
+    shared global state. Keys set to "" override inherited process values
+    that must be treated as unset.
     """
+    global _claude_env_cache
+
     # Import here to avoid circular imports
     from routers.settings import get_api_settings
 
     # Get API settings from database
     api_settings = await get_api_settings()
 
+    cached = _claude_env_cache
+    if cached is not None and cached[0] is api_settings:
+        # Copy so per-session mutation of ClaudeAgentOptions.env can't
+        # bleed into other sessions
+        return dict(cached[1])
+
+    env: dict[str, str] = {}
+
     # Set ANTHROPIC_API_KEY - prefer database setting, fall back to env var
     api_key = api_settings.get("anthropic_api_key") or settings.anthropic_api_key
     if api_key:
-        os.environ["ANTHROPIC_API_KEY"] = api_key
+        env["ANTHROPIC_API_KEY"] = api_key
 
     # Set ANTHROPIC_BASE_URL if configured (for custom endpoints)
     base_url = api_settings.get("anthropic_base_url") or settings.anthropic_base_url
     if base_url:
-        os.environ["ANTHROPIC_BASE_URL"] = base_url
-    elif "ANTHROPIC_BASE_URL" in os.environ:
-        # Clear it if not configured but exists in environment
-        del os.environ["ANTHROPIC_BASE_URL"]
+        env["ANTHROPIC_BASE_URL"] = base_url
+    else:
+        # Clear it if not configured but inherited from the process environment
+        env["ANTHROPIC_BASE_URL"] = ""
 
     # Set CLAUDE_CODE_USE_BEDROCK if enabled - prefer database setting
-    use_bedrock = api_settings.get("use_bedrock", False) or settings.claude_code_use_bedrock
+    use_bedrock = api_settings.get("use_bedrock", False) or USE_BEDROCK
     bedrock_auth_type = api_settings.get("bedrock_auth_type", "credentials")
 
     if use_bedrock:
-        os.environ["CLAUDE_CODE_USE_BEDROCK"] = "true"
+        env["CLAUDE_CODE_USE_BEDROCK"] = "true"
 
         # Get region (common for both auth types)
         aws_region = api_settings.get("aws_region", "us-east-1")
         if aws_region:
-            os.environ["AWS_REGION"] = aws_region
-            os.environ["AWS_DEFAULT_REGION"] = aws_region
+            env["AWS_REGION"] = aws_region
+            env["AWS_DEFAULT_REGION"] = aws_region
 
         if bedrock_auth_type == "bearer_token":
             # Use Bearer Token authentication
             aws_bearer_token = api_settings.get("aws_bearer_token")
             if aws_bearer_token:
-                os.environ["AWS_BEARER_TOKEN_BEDROCK"] = aws_bearer_token
+                env["AWS_BEARER_TOKEN_BEDROCK"] = aws_bearer_token
             # Clear AK/SK credentials when using bearer token
-            os.environ.pop("AWS_ACCESS_KEY_ID", None)
-            os.environ.pop("AWS_SECRET_ACCESS_KEY", None)
-            os.environ.pop("AWS_SESSION_TOKEN", None)
+            env["AWS_ACCESS_KEY_ID"] = ""
+            env["AWS_SECRET_ACCESS_KEY"] = ""
+            env["AWS_SESSION_TOKEN"] = ""
         else:
             # Use AK/SK credentials authentication
             aws_access_key = api_settings.get("aws_access_key_id")
@@ -154,28 +319,30 @@ async def _configure_claude_environment():
             aws_session_token = api_settings.get("aws_session_token")
 
             if aws_access_key:
-                os.environ["AWS_ACCESS_KEY_ID"] = aws_access_key
+                env["AWS_ACCESS_KEY_ID"] = aws_access_key
             if aws_secret_key:
-                os.environ["AWS_SECRET_ACCESS_KEY"] = aws_secret_key
+                env["AWS_SECRET_ACCESS_KEY"] = aws_secret_key
             if aws_session_token:
-                os.environ["AWS_SESSION_TOKEN"] = aws_session_token
+                env["AWS_SESSION_TOKEN"] = aws_session_token
             else:
                 # Clear session token if not provided
-                os.environ.pop("AWS_SESSION_TOKEN", None)
+                env["AWS_SESSION_TOKEN"] = ""
             # Clear bearer token when using AK/SK
-            os.environ.pop("AWS_BEARER_TOKEN_BEDROCK", None)
+            env["AWS_BEARER_TOKEN_BEDROCK"] = ""
     else:
         # Clear Bedrock-related env vars when not using Bedrock
-        os.environ.pop("CLAUDE_CODE_USE_BEDROCK", None)
-        os.environ.pop("AWS_BEARER_TOKEN_BEDROCK", None)
+        env["CLAUDE_CODE_USE_BEDROCK"] = ""
+        env["AWS_BEARER_TOKEN_BEDROCK"] = ""
 
-    # Set CLAUDE_CODE_DISABLE_EXPERIMENTAL_BETAS if enabled (from env only)
-    if settings.claude_code_disable_experimental_betas:
-        os.environ["CLAUDE_CODE_DISABLE_EXPERIMENTAL_BETAS"] = "true"
-    elif "CLAUDE_CODE_DISABLE_EXPERIMENTAL_BETAS" in os.environ:
-        del os.environ["CLAUDE_CODE_DISABLE_EXPERIMENTAL_BETAS"]
+    # Set CLAUDE_CODE_DISABLE_EXPERIMENTAL_BETAS if enabled (from config only)
+    if DISABLE_EXPERIMENTAL_BETAS:
+        env["CLAUDE_CODE_DISABLE_EXPERIMENTAL_BETAS"] = "true"
+    else:
+        env["CLAUDE_CODE_DISABLE_EXPERIMENTAL_BETAS"] = ""
 
     logger.info(f"Claude environment configured - Bedrock: {use_bedrock}, Auth: {bedrock_auth_type if use_bedrock else 'N/A'}, Base URL: {base_url or 'default'}")
+    _claude_env_cache = (api_settings, env)
+    return dict(env)
 
 
 async def pre_tool_logger(
@@ -186,10 +353,31 @@ async def pre_tool_logger(
     """Log tool usage before execution."""
     tool_name = input_data.get('tool_name', 'unknown')
     tool_input = input_data.get('tool_input', {})
-    logger.info(f"[PRE-TOOL] Tool: {tool_name}, Input keys: {list(tool_input.keys())}")
+    logger.info("[PRE-TOOL] Tool: %s, Input keys: %s", tool_name, list(tool_input.keys()))
     return {}
 
 
+# Literal substrings auto-blocked in Bash commands. Fused into one compiled
+# alternation so the command is scanned once in C instead of once per pattern
+# from a Python loop; match.group(0) recovers the offending literal.
+_BLOCKED_SUBSTRINGS = (
+    'rm -rf /',
+    'rm -rf ~',
+    'dd if=/dev/zero',
+    ':(){:|:&};:',
+    '> /dev/sda',
+)
+_BLOCKED_SUBSTRINGS_RE = re.compile(
+    "|".join(re.escape(p) for p in _BLOCKED_SUBSTRINGS)
+)
+
+# Guard: the prefilter must stay a superset requirement for the blocked
+# substrings, or the blocker could skip a command it should deny.
+assert all(
+    any(ch in ('/~->|kKuU') for ch in s) for s in _BLOCKED_SUBSTRINGS
+), "_DANGER_PREFILTER no longer covers every blocked substring"
+
+
 async def dangerous_command_blocker(
     input_data: dict,
     tool_use_id: str | None,
@@ -199,24 +387,20 @@ async def dangerous_command_blocker(
     if input_data.get('tool_name') == 'Bash':
         command = input_data.get('tool_input', {}).get('command', '')
 
-        dangerous_patterns = [
-            'rm -rf /',
-            'rm -rf ~',
-            'dd if=/dev/zero',
-            ':(){:|:&};:',
-            '> /dev/sda',
-        ]
-
-        for pattern in dangerous_patterns:
-            if pattern in command:
-                logger.warning(f"[BLOCKED] Dangerous command: {command}")
-                return {
-                    'hookSpecificOutput': {
-                        'hookEventName': 'PreToolUse',
-                        'permissionDecision': 'deny',
-                        'permissionDecisionReason': f'Dangerous command blocked: {pattern}'
-                    }
+        # Cheap gate for the common harmless case (see _DANGER_PREFILTER)
+        if not _may_be_dangerous(command):
+            return {}
+
+        match = _BLOCKED_SUBSTRINGS_RE.search(command)
+        if match:
+            logger.warning(f"[BLOCKED] Dangerous command: {command}")
+            return {
+                'hookSpecificOutput': {
+                    'hookEventName': 'PreToolUse',
+                    'permissionDecision': 'deny',
+                    'permissionDecisionReason': f'Dangerous command blocked: {match.group(0)}'
                 }
+            }
     return {}
 
 
@@ -238,6 +422,98 @@ DANGEROUS_PATTERNS = [
 ]
 
 
+# All dangerous patterns fused into one compiled alternation so a single scan
+# of the command replaces one re.search per pattern. Each alternative is a
+# named group g<i> whose index maps back into DANGEROUS_PATTERNS.
+_DANGEROUS_RE = re.compile(
+    "|".join(f"(?P<g{i}>{pattern})" for i, (pattern, _) in enumerate(DANGEROUS_PATTERNS)),
+    re.IGNORECASE,
+)
+
+# Prefilter for the dangerous-command checks: every pattern above (and every
+# blocked substring below) can only match a command containing at least one
+# of these characters, so commands without any of them skip the regex scan
+# entirely. str.translate deletes the chars in one C pass; an unchanged
+# length means none were present. Per-pattern witnesses: '/' (rm //chmod/
+# chown/dd), '~' (rm ~), '-' (rm -rf), '>' (disk//etc writes), '|' (fork
+# bomb, curl/wget pipes), 'k'/'K' (mkfs), 'u'/'U' (sudo rm; the fused regex
+# is case-insensitive, hence the uppercase twins).
+_DANGER_PREFILTER = str.maketrans('', '', '/~->|kKuU')
+
+
+def _may_be_dangerous(command: str) -> bool:
+    """Cheap C-level gate: False means no dangerous pattern can match."""
+    return len(command.translate(_DANGER_PREFILTER)) != len(command)
+
+# Bash path-extraction patterns, compiled once at import instead of going
+# through the re cache on every Bash permission check.
+_BASH_PATH_PATTERNS = [
+    re.compile(r'\s+(/[^\s]+)'),  # Absolute paths like /etc/passwd
+    re.compile(r'(?:cat|head|tail|less|more|nano|vi|vim|emacs)\s+([^\s|>&]+)'),  # Read commands
+    re.compile(r'(?:echo|printf|tee)\s+.*?>\s*([^\s|>&]+)'),  # Write redirects
+    re.compile(r'(?:cp|mv|rm|mkdir|rmdir|touch)\s+.*?([^\s|>&]+)'),  # File manipulation
+]
+
+# File tools that need path checking, mapped to their path parameter name.
+# Module-level so the permission handler doesn't rebuild the dict per call.
+_FILE_TOOL_PATH_PARAMS = {
+    'Read': 'file_path',
+    'Write': 'file_path',
+    'Edit': 'file_path',
+    'Glob': 'path',
+    'Grep': 'path',
+}
+
+
+def _format_text_block(block) -> dict:
+    return {
+        "type": "text",
+        "text": block.text
+    }
+
+
+def _format_tool_use_block(block) -> dict:
+    return {
+        "type": "tool_use",
+        "id": block.id,
+        "name": block.name,
+        "input": block.input
+    }
+
+
+def _format_tool_result_block(block) -> dict:
+    # Note: Permission request handling is done via the queue mechanism and
+    # emitted directly in the message loop before formatting. This
+    # ToolResultBlock just contains the normal tool output.
+    # Tool output is usually already a str; don't copy it through str()
+    # again (outputs can be megabytes for Read/Bash/Grep).
+    content = block.content
+    if not content:
+        content = None
+    elif type(content) is not str:
+        content = str(content)
+    return {
+        "type": "tool_result",
+        "tool_use_id": block.tool_use_id,
+        "content": content,
+        "is_error": getattr(block, 'is_error', False)
+    }
+
+
+# Content-block dispatch for _format_message: one dict probe on the exact
+# block type instead of an isinstance chain per streamed block.
+_BLOCK_FORMATTERS = {
+    TextBlock: _format_text_block,
+    ToolUseBlock: _format_tool_use_block,
+    ToolResultBlock: _format_tool_result_block,
+}
+
+
+def _make_title(text: str, limit: int = 50) -> str:
+    """Derive a session title from the first user message, truncated to limit."""
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
 def check_dangerous_command(command: str) -> Optional[str]:
     """Check if command matches dangerous patterns.
 
@@ -247,24 +523,35 @@ def check_dangerous_command(command: str) -> Optional[str]:
     Returns:
         Reason string if dangerous, None otherwise
     """
-    for pattern, reason in DANGEROUS_PATTERNS:
-        if re.search(pattern, command, re.IGNORECASE):
-            return reason
-    return None
-
+    # Cheap gate for the common harmless case (see _DANGER_PREFILTER)
+    if not _may_be_dangerous(command):
+        return None
+    match = _DANGEROUS_RE.search(command)
+    if not match:
+        return None
+    # Exactly one named alternative matched; recover its reason by index.
+    group_name = next(name for name, value in match.groupdict().items() if value is not None)
+    return DANGEROUS_PATTERNS[int(group_name[1:])][1]
 
-def create_human_approval_hook(session_context: dict, session_key: str, enable_human_approval: bool):
-    """Create a human approval hook for dangerous commands.
 
-    Args:
-        session_context: Dict with {"sdk_session_id": ...} that gets updated with actual SDK session
-        session_key: The session key for tracking approved commands (agent_id or resume_session_id)
-        enable_human_approval: Whether human approval is enabled for this agent
+class HumanApprovalHook:
+    """Callable hook that gates dangerous Bash commands behind user approval.
 
-    Returns:
-        Async hook function that checks for dangerous commands and requests approval
+    A __slots__ class instead of a closure: the per-session state lives in
+    three compact slots and every instance shares one __call__ code object,
+    rather than each session allocating a fresh function object plus
+    closure cells that stay alive for the session's lifetime.
     """
-    async def human_approval_hook(
+
+    __slots__ = ('session_context', 'session_key', 'enable_human_approval')
+
+    def __init__(self, session_context: dict, session_key: str, enable_human_approval: bool):
+        self.session_context = session_context
+        self.session_key = session_key
+        self.enable_human_approval = enable_human_approval
+
+    async def __call__(
+        self,
         input_data: dict,
         tool_use_id: str | None,
         context: Any
@@ -283,7 +570,7 @@ def create_human_approval_hook(session_context: dict, session_key: str, enable_h
             return {}
 
         # If human approval is disabled, just block it
-        if not enable_human_approval:
+        if not self.enable_human_approval:
             logger.warning(f"[BLOCKED] Dangerous command (no human approval): {command}")
             return {
                 'hookSpecificOutput': {
@@ -293,33 +580,88 @@ def create_human_approval_hook(session_context: dict, session_key: str, enable_h
                 }
             }
 
+        session_key = self.session_key
+
         # Check if this command was previously approved (use session_key for tracking)
         if is_command_approved(session_key, command):
             logger.info(f"[APPROVED] Previously approved command: {command[:50]}...")
             return {}  # Allow execution
 
         # Get the actual SDK session_id (may have been updated after init message)
-        actual_session_id = session_context.get("sdk_session_id")
+        actual_session_id = self.session_context.get("sdk_session_id")
         logger.info(f"Hook firing with session_key={session_key}, actual_session_id={actual_session_id}")
 
-        # Create permission request
-        request_id = f"perm_{uuid4().hex[:12]}"
-        tool_input_data = input_data.get('tool_input', {})
-        permission_request = {
-            "id": request_id,
-            "session_id": actual_session_id,  # Use actual SDK session_id (not session_key/agent_id)
-            "tool_name": "Bash",
-            "tool_input": json.dumps(tool_input_data),
-            "reason": danger_reason,
-            "status": "pending",
-            "created_at": datetime.now().isoformat()
-        }
+        # Singleflight: if an identical command is already awaiting a decision
+        # for this session, share that request instead of creating a second
+        # DB row and a second approval prompt.
+        inflight_key = (session_key, _hash_command(command))
+        pending = _inflight_permission_requests.get(inflight_key)
+        if pending is not None:
+            logger.info(f"[PERMISSION_REQUEST] Identical command already pending for session {session_key}, awaiting shared decision")
+            return await asyncio.shield(pending)
+
+        decision_future: "asyncio.Future[dict]" = asyncio.get_running_loop().create_future()
+        _inflight_permission_requests[inflight_key] = decision_future
+        try:
+            result = await _request_permission_decision(
+                command, danger_reason, actual_session_id, input_data
+            )
+            return result
+        except BaseException as exc:
+            if not decision_future.done():
+                decision_future.set_exception(exc)
+                # Consume the exception if nobody was waiting on the future
+                decision_future.exception()
+            raise
+        finally:
+            _inflight_permission_requests.pop(inflight_key, None)
+            if not decision_future.done():
+                decision_future.set_result(result)
 
-        # Store in database
-        await db.permission_requests.put(permission_request)
 
-        # Put permission request in queue for SSE streaming (use actual SDK session_id!)
-        await _permission_request_queue.put({
+def create_human_approval_hook(session_context: dict, session_key: str, enable_human_approval: bool):
+    """Create a human approval hook for dangerous commands.
+
+    Args:
+        session_context: Dict with {"sdk_session_id": ...} that gets updated with actual SDK session
+        session_key: The session key for tracking approved commands (agent_id or resume_session_id)
+        enable_human_approval: Whether human approval is enabled for this agent
+
+    Returns:
+        Async callable that checks for dangerous commands and requests approval
+    """
+    return HumanApprovalHook(session_context, session_key, enable_human_approval)
+
+
+async def _request_permission_decision(
+    command: str,
+    danger_reason: str,
+    actual_session_id: Optional[str],
+    input_data: dict,
+) -> dict:
+    """Create a permission request, wait for the user, and map the decision."""
+    # Create permission request
+    request_id = f"perm_{uuid4().hex[:12]}"
+    tool_input_data = input_data.get('tool_input', {})
+    permission_request = {
+        "id": request_id,
+        "session_id": actual_session_id,  # Use actual SDK session_id (not session_key/agent_id)
+        "tool_name": "Bash",
+        "tool_input": _json_dumps_compact(tool_input_data),
+        "reason": danger_reason,
+        "status": "pending",
+        "created_at": _iso_now()
+    }
+
+    # Store in database
+    await db.permission_requests.put(permission_request)
+
+    # Put permission request in this session's queue for SSE streaming
+    # (use actual SDK session_id!)
+    # Non-blocking: if the queue is full the SSE consumer is stalled or gone,
+    # so deny rather than park the SDK's PreToolUse dispatch indefinitely.
+    try:
+        get_permission_request_queue(actual_session_id).put_nowait({
             "sessionId": actual_session_id,  # Use actual SDK session_id for matching
             "requestId": request_id,
             "toolName": "Bash",
@@ -327,82 +669,107 @@ def create_human_approval_hook(session_context: dict, session_key: str, enable_h
             "reason": danger_reason,
             "options": ["approve", "deny"],
         })
+    except asyncio.QueueFull:
+        logger.error(f"[PERMISSION_REQUEST] Queue full, denying request {request_id} for command: {command[:50]}...")
+        await db.permission_requests.update(request_id, {"status": "expired"})
+        return {
+            'hookSpecificOutput': {
+                'hookEventName': 'PreToolUse',
+                'permissionDecision': 'deny',
+                'permissionDecisionReason': f'Dangerous command requires approval but the approval queue is full: {danger_reason}'
+            }
+        }
 
-        logger.warning(f"[PERMISSION_REQUEST] Dangerous command requires approval: {command[:50]}... (request_id: {request_id})")
-        logger.info(f"Waiting for user decision on request {request_id}...")
+    logger.warning(f"[PERMISSION_REQUEST] Dangerous command requires approval: {command[:50]}... (request_id: {request_id})")
+    logger.info(f"Waiting for user decision on request {request_id}...")
 
-        # Suspend execution and wait for user decision
-        decision = await wait_for_permission_decision(request_id)
+    # Suspend execution and wait for user decision
+    decision = await wait_for_permission_decision(request_id)
 
-        logger.info(f"User decision received for request {request_id}: {decision}")
+    logger.info(f"User decision received for request {request_id}: {decision}")
 
-        # Return the decision to the SDK
-        if decision == "approve":
-            # Allow the command to execute
-            return {}
-        else:
-            # Deny the command
-            return {
-                'hookSpecificOutput': {
-                    'hookEventName': 'PreToolUse',
-                    'permissionDecision': 'deny',
-                    'permissionDecisionReason': f'User denied: {danger_reason}'
-                }
+    # Return the decision to the SDK
+    if decision == "approve":
+        # Allow the command to execute
+        return {}
+    else:
+        # Deny the command
+        return {
+            'hookSpecificOutput': {
+                'hookEventName': 'PreToolUse',
+                'permissionDecision': 'deny',
+                'permissionDecisionReason': f'User denied: {danger_reason}'
             }
+        }
 
-    return human_approval_hook
 
 
-def create_file_access_permission_handler(allowed_directories: list[str]):
-    """Create a file access permission handler with allowed directories bound.
+# Cached normpath for the permission handler: agents overwhelmingly touch
+# the same handful of paths repeatedly, so the pure-string normalization is
+# memoized (lru_cache exposes cache_clear for tests). Also skips the
+# os.path attribute walk per call.
+_normpath = lru_cache(maxsize=1024)(os.path.normpath)
 
-    Args:
-        allowed_directories: List of directory paths that are allowed for file access
 
-    Returns:
-        Async permission handler function for can_use_tool
+class FileAccessPermissionHandler:
+    """Callable can_use_tool handler restricting file access to allowed dirs.
+
+    __slots__ instances share one __call__ code object across agents; the
+    precomputed match containers live in compact slots instead of closure
+    cells.
     """
-    # Normalize paths (remove trailing slashes for consistent comparison)
-    normalized_dirs = [d.rstrip('/') for d in allowed_directories]
 
-    async def file_access_permission_handler(
+    __slots__ = ('normalized_dirs', 'allowed_prefixes', 'allowed_exact')
+
+    def __init__(self, allowed_directories: list[str]):
+        # Normalize each directory (collapses '..' and trailing slashes) and
+        # also admit its symlink-resolved form: tool paths are normpath'd but
+        # not resolved, so when an allowed dir itself sits behind a symlink
+        # (e.g. /tmp on macOS) both spellings must match. Deduplicated
+        # preserving order for stable log/deny messages.
+        dirs = {}
+        for d in allowed_directories:
+            dirs[os.path.normpath(d).rstrip('/')] = None
+            dirs[os.path.realpath(d).rstrip('/')] = None
+        self.normalized_dirs = list(dirs)
+
+        # Precompute prefix/exact containers once so the per-call check is a
+        # single C-level startswith(tuple) plus a frozenset probe instead of
+        # a Python loop over every allowed directory.
+        self.allowed_prefixes = tuple(d + '/' for d in self.normalized_dirs)
+        self.allowed_exact = frozenset(self.normalized_dirs)
+
+    def _is_allowed(self, path: str) -> bool:
+        """Normalize a path and check it against the allowed directories.
+
+        Shared by the file-tool and Bash branches: one normpath, then an
+        exact frozenset probe or a single C-level startswith over the
+        prefix tuple.
+        """
+        normalized = _normpath(path)
+        return normalized in self.allowed_exact or normalized.startswith(self.allowed_prefixes)
+
+    async def __call__(
+        self,
         tool_name: str,
         input_data: dict,
         context: dict
     ) -> dict:
         """Check if file access is allowed based on path restrictions."""
-        import os
-        import re
-
-        # File tools that need path checking
-        file_tools = {
-            'Read': 'file_path',
-            'Write': 'file_path',
-            'Edit': 'file_path',
-            'Glob': 'path',
-            'Grep': 'path',
-        }
+        normalized_dirs = self.normalized_dirs
+        _is_allowed = self._is_allowed
 
         # Check file tools
-        if tool_name in file_tools:
-            # Get the path parameter name for this tool
-            path_param = file_tools[tool_name]
+        path_param = _FILE_TOOL_PATH_PARAMS.get(tool_name)
+        if path_param is not None:
             file_path = input_data.get(path_param, '')
 
             # If no path specified, allow (tool will handle the error)
             if not file_path:
                 return {"behavior": "allow"}
 
-            # Normalize the file path (resolve .. and symlinks conceptually)
-            normalized_path = os.path.normpath(file_path)
-
-            # Check if the path is within any allowed directory
-            is_allowed = any(
-                normalized_path.startswith(allowed_dir + '/') or normalized_path == allowed_dir
-                for allowed_dir in normalized_dirs
-            )
-
-            if not is_allowed:
+            # Normalize (resolves ..) and check against allowed directories
+            if not _is_allowed(file_path):
                 logger.warning(f"[FILE ACCESS DENIED] Tool: {tool_name}, Path: {file_path}, Allowed: {normalized_dirs}")
                 return {
                     "behavior": "deny",
@@ -410,7 +777,7 @@ def create_file_access_permission_handler(allowed_directories: list[str]):
                     "interrupt": False  # Don't interrupt, let agent try alternative approach
                 }
 
-            logger.debug(f"[FILE ACCESS ALLOWED] Tool: {tool_name}, Path: {file_path}")
+            logger.debug("[FILE ACCESS ALLOWED] Tool: %s, Path: %s", tool_name, file_path)
             return {"behavior": "allow"}
 
         # Check Bash tool for file access commands
@@ -420,19 +787,11 @@ def create_file_access_permission_handler(allowed_directories: list[str]):
             if not command:
                 return {"behavior": "allow"}
 
-            # Extract potential file paths from bash commands
-            # Match common file access patterns
-            suspicious_patterns = [
-                r'\s+(/[^\s]+)',  # Absolute paths like /etc/passwd
-                r'(?:cat|head|tail|less|more|nano|vi|vim|emacs)\s+([^\s|>&]+)',  # Read commands
-                r'(?:echo|printf|tee)\s+.*?>\s*([^\s|>&]+)',  # Write redirects
-                r'(?:cp|mv|rm|mkdir|rmdir|touch)\s+.*?([^\s|>&]+)',  # File manipulation
-            ]
-
+            # Extract potential file paths from bash commands using the
+            # precompiled module-level patterns
             potential_paths = []
-            for pattern in suspicious_patterns:
-                matches = re.findall(pattern, command)
-                potential_paths.extend(matches)
+            for pattern in _BASH_PATH_PATTERNS:
+                potential_paths.extend(pattern.findall(command))
 
             # Check each potential path
             for file_path in potential_paths:
@@ -441,13 +800,7 @@ def create_file_access_permission_handler(allowed_directories: list[str]):
                     continue
 
                 # Normalize and check
-                normalized_path = os.path.normpath(file_path)
-                is_allowed = any(
-                    normalized_path.startswith(allowed_dir + '/') or normalized_path == allowed_dir
-                    for allowed_dir in normalized_dirs
-                )
-
-                if not is_allowed:
+                if not _is_allowed(file_path):
                     logger.warning(f"[BASH FILE ACCESS DENIED] Command: {command[:100]}, Path: {file_path}, Allowed: {normalized_dirs}")
                     return {
                         "behavior": "deny",
@@ -455,36 +808,64 @@ def create_file_access_permission_handler(allowed_directories: list[str]):
                         "interrupt": False
                     }
 
-            logger.debug(f"[BASH ALLOWED] Command: {command[:100]}")
+            logger.debug("[BASH ALLOWED] Command: %s", command[:100])
             return {"behavior": "allow"}
 
         # Allow all other tools
         return {"behavior": "allow"}
 
-    return file_access_permission_handler
 
+# Handlers are stateless once built, so agents sharing the same directory
+# set (and template rebuilds after cache invalidation) reuse one instance
+# instead of re-normalizing/realpathing the directories.
+_file_handler_cache: dict[tuple[str, ...], FileAccessPermissionHandler] = {}
 
-def create_skill_access_checker(allowed_skill_names: list[str]):
-    """Create a skill access checker hook with the allowed skill names bound.
+
+def create_file_access_permission_handler(allowed_directories: list[str]):
+    """Create a file access permission handler with allowed directories bound.
 
     Args:
-        allowed_skill_names: List of skill folder names that are allowed
+        allowed_directories: List of directory paths that are allowed for file access
 
     Returns:
-        Async hook function that checks skill access
+        Async callable permission handler for can_use_tool
+    """
+    key = tuple(sorted(allowed_directories))
+    handler = _file_handler_cache.get(key)
+    if handler is None:
+        handler = _file_handler_cache[key] = FileAccessPermissionHandler(allowed_directories)
+    return handler
+
+
+class SkillAccessChecker:
+    """Callable hook checking Skill tool calls against an allow-list.
+
+    The membership set and deny-message suffix are bound once at
+    construction: the per-call check is then a single hash probe instead of
+    a list scan, and denials don't rebuild the joined name list.
     """
-    async def skill_access_checker(
+
+    __slots__ = ('allowed', 'allowed_join')
+
+    def __init__(self, allowed_skill_names: list[str]):
+        self.allowed = frozenset(allowed_skill_names)
+        self.allowed_join = ", ".join(allowed_skill_names)
+
+    async def __call__(
+        self,
         input_data: dict,
         tool_use_id: str | None,
         context: Any
     ) -> dict:
         """Check if the requested skill is allowed for this agent."""
         if input_data.get('tool_name') == 'Skill':
+            allowed = self.allowed
+            allowed_join = self.allowed_join
             tool_input = input_data.get('tool_input', {})
             requested_skill = tool_input.get('skill', '')
 
-            # Empty allowed list means no skills are allowed
-            if not allowed_skill_names:
+            # Empty allowed set means no skills are allowed
+            if not allowed:
                 logger.warning(f"[BLOCKED] Skill access denied (no skills allowed): {requested_skill}")
                 return {
                     'hookSpecificOutput': {
@@ -494,21 +875,71 @@ def create_skill_access_checker(allowed_skill_names: list[str]):
                     }
                 }
 
-            # Check if requested skill is in allowed list
-            if requested_skill not in allowed_skill_names:
-                logger.warning(f"[BLOCKED] Skill access denied: {requested_skill} not in {allowed_skill_names}")
+            # Check if requested skill is in allowed set
+            if requested_skill not in allowed:
+                logger.warning(f"[BLOCKED] Skill access denied: {requested_skill} not in {allowed_join}")
                 return {
                     'hookSpecificOutput': {
                         'hookEventName': 'PreToolUse',
                         'permissionDecision': 'deny',
-                        'permissionDecisionReason': f'Skill "{requested_skill}" is not authorized for this agent. Allowed skills: {", ".join(allowed_skill_names)}'
+                        'permissionDecisionReason': f'Skill "{requested_skill}" is not authorized for this agent. Allowed skills: {allowed_join}'
                     }
                 }
 
-            logger.debug(f"[ALLOWED] Skill access granted: {requested_skill}")
+            logger.debug("[ALLOWED] Skill access granted: %s", requested_skill)
         return {}
 
-    return skill_access_checker
+
+def create_skill_access_checker(allowed_skill_names: list[str]):
+    """Create a skill access checker hook with the allowed skill names bound.
+
+    Args:
+        allowed_skill_names: List of skill folder names that are allowed
+
+    Returns:
+        Async callable hook that checks skill access
+    """
+    return SkillAccessChecker(allowed_skill_names)
+
+
+# Static text for the Skill Creator agent, hoisted so each invocation only
+# fills in the name/description holes instead of rebuilding the full
+# multi-line strings.
+_SKILL_CREATOR_PROMPT_TMPL = """Please create a new skill with the following specifications:
+
+**Skill Name:** {name}
+**Skill Description:** {desc}
+
+Use the skill-creator skill (invoke /skill-creator) to guide your skill creation process. Follow the workflow:
+1. Understand the skill requirements from the description above
+2. Plan reusable contents (scripts, references, assets) if needed
+3. Initialize the skill using the init_skill.py script
+4. Edit SKILL.md and create any necessary files
+5. Test any scripts you create
+
+Create the skill in the `.claude/skills/` directory within the current workspace."""
+
+_SKILL_CREATOR_SYSTEM_PROMPT_TMPL = """You are a Skill Creator Agent specialized in creating Claude Code skills.
+
+Your task is to help users create high-quality skills that extend Claude's capabilities.
+
+IMPORTANT GUIDELINES:
+1. Always use the skill-creator skill (invoke /skill-creator) to get guidance on skill creation best practices
+2. Follow the skill creation workflow from the skill-creator skill
+3. Create skills in the `.claude/skills/` directory
+4. Ensure SKILL.md has proper YAML frontmatter with name and description
+5. Keep skills concise and focused - only include what Claude needs
+6. Test any scripts you create before completing
+
+The skill-creator skill provides comprehensive guidance on:
+- Skill anatomy and structure
+- Progressive disclosure design
+- When to use scripts, references, and assets
+- Best practices for SKILL.md content
+
+Current task: Create a skill named "{name}" that {desc}"""
+
+_SKILL_CREATOR_TOOLS = ["Bash", "Read", "Write", "Edit", "Glob", "Grep", "Skill", "TodoWrite", "Task"]
 
 
 class AgentManager:
@@ -520,6 +951,201 @@ class AgentManager:
 
     def __init__(self):
         self._clients: dict[str, ClaudeSDKClient] = {}
+        # Per-agent ClaudeAgentOptions templates keyed by agent_id. The
+        # stored version tuple (updated_at + build flags) detects config
+        # changes; invalidate_resolution_cache clears this too so plugin/MCP
+        # edits take effect without waiting for an agent update.
+        self._options_cache: dict[str, tuple[tuple, ClaudeAgentOptions, dict]] = {}
+        # Agent config records cached under a short TTL so each turn of a
+        # multi-turn session doesn't re-fetch effectively static config
+        # from the DB. Values are the raw records; _get_agent_config hands
+        # out top-level copies because callers patch allowed_tools/add_dirs.
+        self._agent_config_cache: dict[str, tuple[float, dict]] = {}
+        # Message persistence is batched: _save_message enqueues records
+        # and a single writer task group-commits them via put_many, so
+        # bursts pay one DB round-trip per batch instead of per message.
+        self._message_write_queue: asyncio.Queue = asyncio.Queue()
+        self._message_writer_task: Optional[asyncio.Task] = None
+
+    _AGENT_CONFIG_TTL = 30.0
+
+    # Message writer batching: cap per-batch size and how long the writer
+    # waits for more records after the first arrives.
+    _MESSAGE_BATCH_MAX = 32
+    _MESSAGE_BATCH_WINDOW = 0.005
+
+    def _ensure_message_writer(self):
+        """Start the background message writer task if not running."""
+        if self._message_writer_task is None or self._message_writer_task.done():
+            self._message_writer_task = asyncio.get_running_loop().create_task(
+                self._message_writer_loop()
+            )
+
+    async def _message_writer_loop(self):
+        """Drain queued message records into batched put_many writes.
+
+        Flush sentinels (futures) ride the same queue and are resolved once
+        every record enqueued before them has been committed.
+        """
+        queue = self._message_write_queue
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self._MESSAGE_BATCH_WINDOW
+            while len(batch) < self._MESSAGE_BATCH_MAX:
+                try:
+                    batch.append(queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Replay the batch in queue order as runs of inserts (dicts) and
+            # block appends (tuples): an append always follows the insert
+            # that created its row, so order within the batch must hold.
+            idx = 0
+            size = len(batch)
+            while idx < size:
+                entry = batch[idx]
+                if isinstance(entry, dict):
+                    records = [entry]
+                    idx += 1
+                    while idx < size and isinstance(batch[idx], dict):
+                        records.append(batch[idx])
+                        idx += 1
+                    try:
+                        await db.messages.put_many(records)
+                    except Exception as e:
+                        logger.error(f"Failed to persist batch of {len(records)} messages: {e}")
+                elif isinstance(entry, tuple):
+                    # Coalesce consecutive appends to the same message
+                    message_id, blocks = entry[0], list(entry[1])
+                    idx += 1
+                    while idx < size and isinstance(batch[idx], tuple) and batch[idx][0] == message_id:
+                        blocks.extend(batch[idx][1])
+                        idx += 1
+                    try:
+                        await db.messages.append_blocks(message_id, blocks)
+                    except Exception as e:
+                        logger.error(f"Failed to append {len(blocks)} blocks to message {message_id}: {e}")
+                else:
+                    # Flush sentinel; resolved below once the batch is done
+                    idx += 1
+            for entry in batch:
+                if isinstance(entry, asyncio.Future) and not entry.done():
+                    entry.set_result(None)
+
+    async def flush_messages(self):
+        """Wait until every queued message has been written to the DB."""
+        if self._message_writer_task is None or self._message_writer_task.done():
+            return
+        sentinel: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._message_write_queue.put_nowait(sentinel)
+        await sentinel
+
+    async def _get_agent_config(self, agent_id: str) -> Optional[dict]:
+        """Fetch an agent config via the short-TTL cache.
+
+        Returns a shallow copy of the record (callers mutate top-level keys
+        only), or None if the agent does not exist.
+        """
+        entry = self._agent_config_cache.get(agent_id)
+        now = time.monotonic()
+        if entry is not None and now - entry[0] < self._AGENT_CONFIG_TTL:
+            return dict(entry[1])
+        record = await db.agents.get(agent_id)
+        if record is None:
+            self._agent_config_cache.pop(agent_id, None)
+            return None
+        self._agent_config_cache[agent_id] = (now, record)
+        return dict(record)
+
+    def invalidate_agent_config(self, agent_id: Optional[str] = None):
+        """Drop cached agent config (one agent, or all) after a mutation."""
+        if agent_id is None:
+            self._agent_config_cache.clear()
+        else:
+            self._agent_config_cache.pop(agent_id, None)
+
+    async def _resolve_plugins(self, plugin_ids: list[str]) -> list[dict]:
+        """Resolve plugin IDs to SDK plugin configs.
+
+        Plugin records are fetched in parallel instead of one DB round-trip
+        per plugin.
+        """
+        # Get skills directory for fallback path computation
+        from core.plugin_manager import plugin_manager
+        skills_dir = plugin_manager.skills_dir
+
+        records = await asyncio.gather(*(db.plugins.get(pid) for pid in plugin_ids))
+
+        plugins = []
+        for plugin_id, plugin in zip(plugin_ids, records):
+            if plugin:
+                install_path = plugin.get("install_path")
+
+                # Fallback: compute install_path from installed_skills if missing
+                if not install_path:
+                    installed_skills = plugin.get("installed_skills", [])
+                    if isinstance(installed_skills, str):
+                        try:
+                            installed_skills = json.loads(installed_skills)
+                        except Exception:
+                            installed_skills = []
+                    if installed_skills and len(installed_skills) > 0:
+                        install_path = str(skills_dir / installed_skills[0])
+                        logger.info(f"Computed install_path for plugin {plugin_id} from installed_skills: {install_path}")
+                        # Update the database with the computed path
+                        await db.plugins.update(plugin_id, {"install_path": install_path})
+
+                if install_path:
+                    plugins.append({
+                        "type": "local",
+                        "path": install_path
+                    })
+                    logger.info(f"Added plugin: {plugin_id} ({plugin.get('name')}) from {install_path}")
+                else:
+                    logger.warning(
+                        f"Plugin {plugin_id} ({plugin.get('name')}) has no install_path and no installed_skills. "
+                        f"Status: {plugin.get('status')}, installed_at: {plugin.get('installed_at')}"
+                    )
+            else:
+                logger.warning(f"Plugin {plugin_id} not found in database")
+        return plugins
+
+    async def _resolve_mcp_servers(self, mcp_ids: list[str]) -> dict[str, dict]:
+        """Resolve MCP server IDs to SDK server configs with one parallel fetch."""
+        records = await asyncio.gather(*(db.mcp_servers.get(mcp_id) for mcp_id in mcp_ids))
+
+        mcp_servers = {}
+        for mcp_id, mcp_config in zip(mcp_ids, records):
+            if mcp_config:
+                connection_type = mcp_config.get("connection_type", "stdio")
+                config = mcp_config.get("config", {})
+
+                if connection_type == "stdio":
+                    mcp_servers[mcp_id] = {
+                        "type": "stdio",
+                        "command": config.get("command"),
+                        "args": config.get("args", []),
+                    }
+                elif connection_type == "sse":
+                    mcp_servers[mcp_id] = {
+                        "type": "sse",
+                        "url": config.get("url"),
+                    }
+                elif connection_type == "http":
+                    mcp_servers[mcp_id] = {
+                        "type": "http",
+                        "url": config.get("url"),
+                    }
+        return mcp_servers
 
     async def _build_options(
         self,
@@ -527,15 +1153,91 @@ class AgentManager:
         enable_skills: bool,
         enable_mcp: bool,
         resume_session_id: Optional[str] = None,
-        session_context: Optional[dict] = None
+        session_context: Optional[dict] = None,
+        claude_env: Optional[dict[str, str]] = None
     ) -> ClaudeAgentOptions:
         """Build ClaudeAgentOptions from agent configuration.
 
+        The config-derived parts (tools, plugins, MCP servers, workspace,
+        sandbox, file-access handler) are cached per agent keyed on the
+        config's updated_at, so repeat turns of the same agent only patch
+        the per-session fields (human-approval hook, resume, env) onto a
+        copy of the cached template instead of re-running the full builder.
+
         Args:
             agent_config: Agent configuration dictionary
             enable_skills: Whether to enable skills
             enable_mcp: Whether to enable MCP servers
             resume_session_id: Optional session ID to resume (for multi-turn conversations)
+            claude_env: Environment overlay from _configure_claude_environment,
+                passed to the CLI subprocess via ClaudeAgentOptions.env
+        """
+        agent_id = agent_config.get("id")
+        use_bedrock = (claude_env or {}).get("CLAUDE_CODE_USE_BEDROCK", "").lower() == "true"
+        version = (
+            agent_config.get("updated_at"),
+            enable_skills,
+            enable_mcp,
+            tuple(agent_config.get("add_dirs", []) or []),
+            # Callers patch allowed_tools before building (run_conversation
+            # clears it to fall back to the enable-flag list), so the
+            # effective value must be part of the key or the paths would
+            # share a template built for the wrong tool set
+            tuple(agent_config.get("allowed_tools", []) or []),
+            use_bedrock,
+        )
+
+        cached = self._options_cache.get(agent_id) if agent_id else None
+        if cached is not None and cached[0] == version:
+            template, base_hooks = cached[1], cached[2]
+        else:
+            template, base_hooks = await self._build_options_template(
+                agent_config, enable_skills, enable_mcp, use_bedrock
+            )
+            if agent_id:
+                self._options_cache[agent_id] = (version, template, base_hooks)
+
+        # Per-session patching: shallow-copy the template and rebuild only the
+        # fields that close over session state. HookMatcher entries in
+        # base_hooks are stateless (or close over config-invariant data) and
+        # are shared across sessions; the lists holding them are copied so the
+        # per-session human-approval matcher never leaks into the template.
+        options = copy.copy(template)
+        hooks = {event: list(matchers) for event, matchers in base_hooks.items()}
+
+        # Add human approval hook for dangerous commands
+        # Use resume_session_id for resumed sessions, or agent_id for new sessions
+        # The session_key is used for tracking approved commands - must match what's
+        # stored in the permission_request and used in continue_with_permission
+        if agent_config.get("enable_human_approval", True):
+            session_key = resume_session_id or agent_id or "unknown"
+            # Use provided session_context or create a temporary one
+            hook_session_context = session_context if session_context is not None else {"sdk_session_id": resume_session_id or agent_id}
+            human_approval = create_human_approval_hook(hook_session_context, session_key, True)
+            hooks.setdefault("PreToolUse", []).append(
+                HookMatcher(matcher="Bash", hooks=[human_approval])
+            )
+            logger.info(f"Human approval hook added for session_key: {session_key}")
+
+        options.hooks = hooks if hooks else None
+        options.resume = resume_session_id
+        options.env = claude_env or {}
+        return options
+
+    async def _build_options_template(
+        self,
+        agent_config: dict,
+        enable_skills: bool,
+        enable_mcp: bool,
+        use_bedrock: bool
+    ) -> tuple[ClaudeAgentOptions, dict]:
+        """Build the per-agent ClaudeAgentOptions template and its base hooks.
+
+        Everything here depends only on the agent configuration, not on the
+        session, so _build_options caches the result until the config's
+        updated_at changes. Returns the template (hooks/resume/env unset)
+        and the session-independent hooks dict separately so the caller can
+        copy and extend the latter per session.
         """
 
         # Build allowed tools list - use directly from config if provided
@@ -557,74 +1259,49 @@ class AgentManager:
         # Note: Skill tool is now user-controllable via the Advanced Tools section
         # If user wants to use skills, they need to enable the Skill tool explicitly
 
-        # Plugins configuration
+        # Skill access control - get allowed skill names for this agent
+        skill_ids = agent_config.get("skill_ids", [])
+        allow_all_skills = agent_config.get("allow_all_skills", False)
+        global_user_mode = agent_config.get("global_user_mode", True)
+
+        # Global User Mode requires allow_all_skills=True (skill restrictions not supported)
+        if global_user_mode:
+            allow_all_skills = True
+            skill_ids = []  # Ignore skill_ids in global mode
+            logger.info("Global User Mode: forcing allow_all_skills=True, ignoring skill_ids")
+
+        # Plugin, MCP and skill-name resolutions are independent DB lookups
+        # (each fanned out in parallel and cached under a short TTL), so run
+        # the three of them concurrently instead of paying their latencies
+        # back to back.
         plugins = []
+        mcp_servers = {}
         plugin_ids = agent_config.get("plugin_ids", [])
+        mcp_ids = agent_config.get("mcp_ids") if enable_mcp else None
+        async with asyncio.TaskGroup() as tg:
+            if plugin_ids:
+                plugins_task = tg.create_task(_cached_resolution(
+                    ("plugins", tuple(plugin_ids)),
+                    lambda: self._resolve_plugins(plugin_ids),
+                ))
+            if mcp_ids:
+                mcp_task = tg.create_task(_cached_resolution(
+                    ("mcp", tuple(mcp_ids)),
+                    lambda: self._resolve_mcp_servers(mcp_ids),
+                ))
+            skills_task = tg.create_task(_cached_resolution(
+                ("skills", tuple(skill_ids), allow_all_skills),
+                lambda: workspace_manager.get_allowed_skill_names(
+                    skill_ids=skill_ids,
+                    allow_all_skills=allow_all_skills
+                ),
+            ))
         if plugin_ids:
-            # Get skills directory for fallback path computation
-            from core.plugin_manager import plugin_manager
-            skills_dir = plugin_manager.skills_dir
-
-            for plugin_id in plugin_ids:
-                plugin = await db.plugins.get(plugin_id)
-                if plugin:
-                    install_path = plugin.get("install_path")
-
-                    # Fallback: compute install_path from installed_skills if missing
-                    if not install_path:
-                        installed_skills = plugin.get("installed_skills", [])
-                        if isinstance(installed_skills, str):
-                            try:
-                                installed_skills = json.loads(installed_skills)
-                            except Exception:
-                                installed_skills = []
-                        if installed_skills and len(installed_skills) > 0:
-                            install_path = str(skills_dir / installed_skills[0])
-                            logger.info(f"Computed install_path for plugin {plugin_id} from installed_skills: {install_path}")
-                            # Update the database with the computed path
-                            await db.plugins.update(plugin_id, {"install_path": install_path})
-
-                    if install_path:
-                        plugins.append({
-                            "type": "local",
-                            "path": install_path
-                        })
-                        logger.info(f"Added plugin: {plugin_id} ({plugin.get('name')}) from {install_path}")
-                    else:
-                        logger.warning(
-                            f"Plugin {plugin_id} ({plugin.get('name')}) has no install_path and no installed_skills. "
-                            f"Status: {plugin.get('status')}, installed_at: {plugin.get('installed_at')}"
-                        )
-                else:
-                    logger.warning(f"Plugin {plugin_id} not found in database")
-
-        # MCP servers configuration
-        mcp_servers = {}
-
-        # Add external MCP servers if enabled
-        if enable_mcp and agent_config.get("mcp_ids"):
-            for mcp_id in agent_config["mcp_ids"]:
-                mcp_config = await db.mcp_servers.get(mcp_id)
-                if mcp_config:
-                    connection_type = mcp_config.get("connection_type", "stdio")
-                    config = mcp_config.get("config", {})
-
-                    if connection_type == "stdio":
-                        mcp_servers[mcp_id] = {
-                            "type": "stdio",
-                            "command": config.get("command"),
-                            "args": config.get("args", []),
-                        }
-                    elif connection_type == "sse":
-                        mcp_servers[mcp_id] = {
-                            "type": "sse",
-                            "url": config.get("url"),
-                        }
-                    elif connection_type == "http":
-                        mcp_servers[mcp_id] = {
-                            "type": "http",
-                            "url": config.get("url"),
-                        }
+            plugins = plugins_task.result()
+        if mcp_ids:
+            mcp_servers = mcp_task.result()
+        allowed_skill_names = skills_task.result()
+        logger.info("Agent skill access: allow_all=%s, skill_ids=%s, allowed_names=%s", allow_all_skills, skill_ids, allowed_skill_names)
 
         # Build system prompt
         system_prompt = agent_config.get("system_prompt")
@@ -648,43 +1325,7 @@ class AgentManager:
                 HookMatcher(matcher="Bash", hooks=[dangerous_command_blocker])
             )
 
-        # Add human approval hook for dangerous commands
-        # Use resume_session_id for resumed sessions, or agent_id for new sessions
-        # The session_key is used for tracking approved commands - must match what's
-        # stored in the permission_request and used in continue_with_permission
         agent_id = agent_config.get("id")
-        session_key = resume_session_id or agent_id or "unknown"
-
-        # Enable human approval hook if configured
-        enable_human_approval = agent_config.get("enable_human_approval", True)
-        if enable_human_approval:
-            if "PreToolUse" not in hooks:
-                hooks["PreToolUse"] = []
-            # Use provided session_context or create a temporary one
-            hook_session_context = session_context if session_context is not None else {"sdk_session_id": resume_session_id or agent_id}
-            human_approval = create_human_approval_hook(hook_session_context, session_key, enable_human_approval)
-            hooks["PreToolUse"].append(
-                HookMatcher(matcher="Bash", hooks=[human_approval])
-            )
-            logger.info(f"Human approval hook added for session_key: {session_key}")
-
-        # Skill access control - get allowed skill names for this agent
-        skill_ids = agent_config.get("skill_ids", [])
-        allow_all_skills = agent_config.get("allow_all_skills", False)
-        global_user_mode = agent_config.get("global_user_mode", True)
-
-        # Global User Mode requires allow_all_skills=True (skill restrictions not supported)
-        if global_user_mode:
-            allow_all_skills = True
-            skill_ids = []  # Ignore skill_ids in global mode
-            logger.info("Global User Mode: forcing allow_all_skills=True, ignoring skill_ids")
-
-        # Get allowed skill names for hook-based access control
-        allowed_skill_names = await workspace_manager.get_allowed_skill_names(
-            skill_ids=skill_ids,
-            allow_all_skills=allow_all_skills
-        )
-        logger.info(f"Agent skill access: allow_all={allow_all_skills}, skill_ids={skill_ids}, allowed_names={allowed_skill_names}")
 
         # Add skill access checker hook (double protection with per-agent workspace)
         # Skip adding the hook when allow_all_skills is True (no restrictions needed)
@@ -697,6 +1338,10 @@ class AgentManager:
             )
             logger.info(f"Skill access checker hook added for skills: {allowed_skill_names}")
 
+        # Runtime add_dirs (from "Work in a folder"); read once — used for
+        # the allowed-directory list and the effective cwd below
+        add_dirs = tuple(agent_config.get("add_dirs") or ())
+
         # Determine workspace mode and working directory
         # agent_id already retrieved above for human approval hook
         global_user_mode = agent_config.get("global_user_mode", True)
@@ -725,24 +1370,25 @@ class AgentManager:
             file_access_enabled = False
         else:
             file_access_enabled = agent_config.get("enable_file_access_control", True)
+        # When the user works in a folder, the first add_dir becomes the cwd;
+        # the agent workspace stays in the allowed list either way
+        effective_cwd = add_dirs[0] if add_dirs else working_directory
+
         file_access_handler = None
         if file_access_enabled:
-            allowed_directories = [working_directory]
-            # Add any additional allowed directories from config
-            extra_dirs = agent_config.get("allowed_directories", [])
-            if extra_dirs:
-                allowed_directories.extend(extra_dirs)
-            # Add runtime add_dirs (from "Work in a folder" feature)
-            add_dirs = agent_config.get("add_dirs", [])
-            if add_dirs:
-                allowed_directories.extend(add_dirs)
+            # Workspace + any configured extra directories + runtime add_dirs
+            allowed_directories = [
+                working_directory,
+                *(agent_config.get("allowed_directories") or ()),
+                *add_dirs,
+            ]
             file_access_handler = create_file_access_permission_handler(allowed_directories)
             logger.info(f"File access control enabled, allowed directories: {allowed_directories}")
         
         # Build sandbox configuration (SDK built-in bash sandboxing)
         sandbox_settings = None
         sandbox_config = agent_config.get("sandbox", {})
-        sandbox_enabled = sandbox_config.get("enabled", settings.sandbox_enabled_default)
+        sandbox_enabled = sandbox_config.get("enabled", SANDBOX_ENABLED_DEFAULT)
 
         # Determine permission mode
         # Note: Previously we downgraded bypassPermissions to acceptEdits when sandbox enabled,
@@ -750,9 +1396,8 @@ class AgentManager:
         permission_mode = agent_config.get("permission_mode", "bypassPermissions")
 
         # Get model from config and convert to Bedrock model ID if using Bedrock
-        # Check runtime env var (set by _configure_claude_environment) rather than static settings
+        # use_bedrock comes from the env overlay (built by _configure_claude_environment)
         model = agent_config.get("model")
-        use_bedrock = os.environ.get("CLAUDE_CODE_USE_BEDROCK", "").lower() == "true"
         if model and use_bedrock:
             model = get_bedrock_model_id(model)
             logger.info(f"Using Bedrock model: {model}")
@@ -770,37 +1415,30 @@ class AgentManager:
 
             # Get excluded commands from config or settings
             excluded_commands = sandbox_config.get("excluded_commands", [])
-            if not excluded_commands and settings.sandbox_excluded_commands:
-                excluded_commands = [cmd.strip() for cmd in settings.sandbox_excluded_commands.split(",") if cmd.strip()]
+            if not excluded_commands:
+                excluded_commands = _SANDBOX_EXCLUDED_COMMANDS
 
             sandbox_settings = {
                 "enabled": True,
                 "autoAllowBashIfSandboxed": sandbox_config.get(
                     "auto_allow_bash_if_sandboxed",
-                    settings.sandbox_auto_allow_bash
+                    SANDBOX_AUTO_ALLOW_BASH
                 ),
                 "excludedCommands": excluded_commands,
                 "allowUnsandboxedCommands": sandbox_config.get(
                     "allow_unsandboxed_commands",
-                    settings.sandbox_allow_unsandboxed
+                    SANDBOX_ALLOW_UNSANDBOXED
                 ),
             }
             if network_config:
                 sandbox_settings["network"] = network_config
 
-            logger.info(f"Sandbox enabled: {sandbox_settings}")
+            logger.info("Sandbox enabled: %s", sandbox_settings)
         
         def stderr_callback(input):
             logger.error(input)
 
-        # Get add_dirs for ClaudeAgentOptions
-        sdk_add_dirs = agent_config.get("add_dirs", [])
-        if sdk_add_dirs:
-            working_directory = sdk_add_dirs[0]
-        # Max buffer size for JSON messages (default 10MB to handle large tool outputs)
-        max_buffer_size = int(os.environ.get("MAX_BUFFER_SIZE", 10 * 1024 * 1024))
-
-        return ClaudeAgentOptions(
+        template = ClaudeAgentOptions(
             system_prompt=system_prompt_config,
             allowed_tools=allowed_tools if allowed_tools else None,
             mcp_servers=mcp_servers if mcp_servers else None,
@@ -809,18 +1447,19 @@ class AgentManager:
             model=model,
             stderr=stderr_callback,
             # if user select a folder as working directory.
-            cwd=working_directory ,
+            cwd=effective_cwd,
             # setting_sources controls where Claude Code loads settings from:
             # - 'project' = only from cwd (isolated mode)
             # - 'user' = also from ~/.claude/ (global mode, enables user-level skills)
             setting_sources=setting_sources,
-            hooks=hooks if hooks else None,
-            resume=resume_session_id,  # Resume from previous session for multi-turn
             sandbox=sandbox_settings,  # Built-in SDK sandbox for bash isolation
             can_use_tool=file_access_handler,  # File access control
-            max_buffer_size=max_buffer_size,  # Increase buffer for large JSON messages
+            max_buffer_size=MAX_BUFFER_SIZE,  # Increase buffer for large JSON messages
+            # hooks/resume/env are session-specific; _build_options patches
+            # them onto a copy of this template per call.
             # add_dirs=sdk_add_dirs if sdk_add_dirs else None,  # Additional directories for Claude to access
         )
+        return template, hooks
 
     async def _save_message(
         self,
@@ -838,7 +1477,8 @@ class AgentManager:
             model: Optional model name for assistant messages
 
         Returns:
-            The saved message dict
+            The saved message dict (persisted asynchronously by the batch
+            writer; await flush_messages() for durability)
         """
         message_data = {
             "id": str(uuid4()),
@@ -846,11 +1486,22 @@ class AgentManager:
             "role": role,
             "content": content,
             "model": model,
-            "created_at": datetime.now().isoformat(),
+            "created_at": _iso_now(),
         }
-        await db.messages.put(message_data)
+        self._ensure_message_writer()
+        await self._message_write_queue.put(message_data)
         return message_data
 
+    async def _append_message_blocks(self, message_id: str, blocks: list[dict]):
+        """Append content blocks to an already-saved message.
+
+        Rides the same batch writer queue as _save_message, so appends stay
+        ordered after the insert that created the row and consecutive
+        appends to one message coalesce into a single DB update.
+        """
+        self._ensure_message_writer()
+        await self._message_write_queue.put((message_id, list(blocks)))
+
     async def get_session_messages(self, session_id: str) -> list[dict]:
         """Get all messages for a session.
 
@@ -900,13 +1551,10 @@ class AgentManager:
             # Use multimodal content directly
             query_content = content
             # Extract display text for session title (first text block or "Attachment")
-            display_text = None
-            for block in content:
-                if block.get("type") == "text" and block.get("text"):
-                    display_text = block.get("text")
-                    break
-            if not display_text:
-                display_text = "[Attachment message]"
+            display_text = next(
+                (block["text"] for block in content if block.get("type") == "text" and block.get("text")),
+                "[Attachment message]",
+            )
         elif user_message is not None:
             # Simple text message - wrap in content array
             query_content = user_message
@@ -919,7 +1567,7 @@ class AgentManager:
             return
 
         # Get agent config
-        agent_config = await db.agents.get(agent_id)
+        agent_config = await self._get_agent_config(agent_id)
         if not agent_config:
             yield {
                 "type": "error",
@@ -936,9 +1584,12 @@ class AgentManager:
             work_dir = add_dirs[0]  # First directory is the working directory
             logger.info(f"Adding extra directories: {add_dirs}")
 
-        logger.info(f"Running conversation with agent {agent_id}, session {session_id}, is_resuming={is_resuming}")
-        logger.info(f"Agent config: {agent_config}")
-        logger.info(f"Content type: {'multimodal' if content else 'text'}")
+        logger.info("Running conversation with agent %s, session %s, is_resuming=%s", agent_id, session_id, is_resuming)
+        # repr of the full config dict is expensive; only build it when DEBUG
+        # output is actually going somewhere
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Agent config: %s", agent_config)
+        logger.info("Content type: %s", "multimodal" if content else "text")
 
         # For resumed sessions, we can send session_start immediately
         # For new sessions, we'll send it after capturing SDK session_id
@@ -947,9 +1598,10 @@ class AgentManager:
                 "type": "session_start",
                 "sessionId": session_id,
             }
-            # Store/update session for resumed conversations
-            title = display_text[:50] + "..." if len(display_text) > 50 else display_text
-            await session_manager.store_session(session_id, agent_id, title, work_dir=work_dir)
+            # Store/update session for resumed conversations (no-op when the
+            # session is cached and title/work_dir are unchanged)
+            title = _make_title(display_text)
+            await session_manager.touch_session(session_id, agent_id, title, work_dir=work_dir)
 
             # Save user message to database for resumed sessions
             # Store original content if multimodal, otherwise wrap text
@@ -960,8 +1612,8 @@ class AgentManager:
                 content=user_content
             )
 
-        # Configure Claude environment variables
-        await _configure_claude_environment()
+        # Build the Claude environment overlay for the CLI subprocess
+        claude_env = await _configure_claude_environment()
 
         # Track the actual SDK session_id (captured from init message)
         # Use a dict so forwarder task can see updates (mutable container)
@@ -969,15 +1621,35 @@ class AgentManager:
         session_context = {"sdk_session_id": session_id}  # Will be updated for new sessions
 
         # Build options - use resume parameter if continuing an existing session
-        options = await self._build_options(agent_config, enable_skills, enable_mcp, session_id if is_resuming else None, session_context)
-        logger.info(f"Built options - allowed_tools: {options.allowed_tools}, permission_mode: {options.permission_mode}, resume: {session_id if is_resuming else None}")
-        logger.info(f"MCP servers: {options.mcp_servers}")
-        logger.info(f"Working directory: {options.cwd}")
-        logger.info(f"Add dirs: {options.add_dirs}")
-
-        # Collect assistant response content for saving
-        assistant_content = []
-        assistant_model = None
+        options = await self._build_options(agent_config, enable_skills, enable_mcp, session_id if is_resuming else None, session_context, claude_env=claude_env)
+        logger.info("Built options - permission_mode: %s, resume: %s, cwd: %s", options.permission_mode, session_id if is_resuming else None, options.cwd)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Allowed tools: %s", options.allowed_tools)
+            logger.debug("MCP servers: %s", options.mcp_servers)
+            logger.debug("Add dirs: %s", options.add_dirs)
+
+        # Assistant content is persisted incrementally: the first block
+        # creates the message row, later blocks append to it via the batch
+        # writer, so long tool-heavy turns don't buffer every block in
+        # memory for one big write at the end.
+        assistant_message_id = None
+
+        async def persist_assistant_blocks(blocks: list[dict], model: Optional[str] = None):
+            """Create the assistant row on the first blocks, append after."""
+            nonlocal assistant_message_id
+            sdk_session = session_context["sdk_session_id"]
+            if not sdk_session:
+                return
+            if assistant_message_id is None:
+                saved = await self._save_message(
+                    session_id=sdk_session,
+                    role="assistant",
+                    content=list(blocks),
+                    model=model,
+                )
+                assistant_message_id = saved["id"]
+            else:
+                await self._append_message_blocks(assistant_message_id, blocks)
 
         try:
             logger.info(f"Creating ClaudeSDKClient...")
@@ -988,9 +1660,9 @@ class AgentManager:
                     self._clients[session_id] = client
                 logger.info(f"ClaudeSDKClient created, is_resuming={is_resuming}")
 
-                # Initialize task variables before try block to ensure they exist in finally
-                sdk_reader_task = None
-                forwarder_task = None
+                # Initialize in-flight futures before try block to ensure they exist in finally
+                sdk_next = None
+                perm_next = None
 
                 try:
                     logger.info(f"Sending query: {display_text[:100] if display_text else 'multimodal'}...")
@@ -1014,16 +1686,43 @@ class AgentManager:
                         await client.query(query_content)
                     logger.info(f"Query sent, waiting for response...")
 
-                    # Create combined queue for merging SDK messages and permission requests
-                    combined_queue = asyncio.Queue()
+                    # Race the next SDK message against this session's
+                    # permission queue with two in-flight futures instead of
+                    # fanning both into an intermediate queue via background
+                    # tasks: one task switch per event, no sentinel protocol,
+                    # and no polling while waiting for the session_id.
                     message_count = 0
+                    sdk_iter = client.receive_response().__aiter__()
+                    sdk_next = asyncio.ensure_future(anext(sdk_iter))
 
-                    # Background task to read SDK messages and put in combined queue
-                    async def sdk_message_reader():
-                        """Read SDK messages and put them in the combined queue."""
+                    # Main loop: process whichever future finishes first
+                    while True:
+                        # The permission queue is keyed by the SDK session_id,
+                        # which for new sessions is only known after the init
+                        # message; arm its future once the id appears.
+                        if perm_next is None and session_context["sdk_session_id"]:
+                            perm_queue = get_permission_request_queue(session_context["sdk_session_id"])
+                            perm_next = asyncio.ensure_future(perm_queue.get())
+
+                        in_flight = {sdk_next} if perm_next is None else {sdk_next, perm_next}
+                        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+
+                        # Handle permission requests
+                        if perm_next is not None and perm_next in done:
+                            request = perm_next.result()
+                            perm_next = None  # re-armed next iteration
+                            logger.info(f"Emitting permission request: {request.get('requestId')}")
+                            yield {"type": "permission_request", **request}
+
+                        if sdk_next not in done:
+                            continue
+
+                        # Handle SDK messages (exhaustion and errors included)
                         try:
-                            async for message in client.receive_response():
-                                await combined_queue.put({"source": "sdk", "message": message})
+                            message = sdk_next.result()
+                        except StopAsyncIteration:
+                            logger.info("SDK iterator finished, exiting message loop")
+                            break
                         except Exception as e:
                             import traceback
                             error_traceback = traceback.format_exc()
@@ -1034,211 +1733,140 @@ class AgentManager:
                                 logger.error(f"SDK stderr: {e.stderr}")  # type: ignore[attr-defined]
                             if hasattr(e, 'stdout'):
                                 logger.error(f"SDK stdout: {e.stdout}")  # type: ignore[attr-defined]
-                            await combined_queue.put({"source": "error", "error": str(e), "detail": error_traceback})
-                        finally:
-                            # Signal that SDK stream is done
-                            await combined_queue.put({"source": "sdk_done"})
-                            logger.debug("SDK message reader finished")
-
-                    # Background task to forward permission requests for this session
-                    async def permission_request_forwarder():
-                        """Monitor global queue and forward requests for this session."""
-                        try:
-                            while True:
-                                # Get request from global queue
-                                request = await _permission_request_queue.get()
-
-                                # Check if it belongs to this session
-                                current_session_id = session_context["sdk_session_id"]
-                                if request.get("sessionId") == current_session_id:
-                                    # Forward to combined queue
-                                    logger.info(f"Forwarding permission request {request.get('requestId')} to combined queue for session {current_session_id}")
-                                    await combined_queue.put({"source": "permission", "request": request})
-                                else:
-                                    # Put it back for other sessions
-                                    logger.debug(f"Request {request.get('requestId')} for session {request.get('sessionId')} doesn't match current session {current_session_id}, putting back")
-                                    await _permission_request_queue.put(request)
-                                    # Small delay to avoid busy loop
-                                    await asyncio.sleep(0.01)
-                        except asyncio.CancelledError:
-                            logger.debug("Permission request forwarder cancelled")
-                            raise
-
-                    # Start both background tasks
-                    sdk_reader_task = asyncio.create_task(sdk_message_reader())
-                    forwarder_task = asyncio.create_task(permission_request_forwarder())
-
-                    # Main loop: process items from combined queue
-                    while True:
-                        item = await combined_queue.get()
-
-                        # Check if SDK stream is done
-                        if item["source"] == "sdk_done":
-                            logger.info("SDK iterator finished, exiting message loop")
                             break
+                        sdk_next = asyncio.ensure_future(anext(sdk_iter))
 
-                        # Handle permission requests
-                        if item["source"] == "permission":
-                            request = item["request"]
-                            logger.info(f"Emitting permission request: {request.get('requestId')}")
-                            yield {"type": "permission_request", **request}
-                            continue
-
-                        # Handle errors from SDK reader
-                        if item["source"] == "error":
-                            logger.error(f"Error from SDK reader: {item['error']}")
-                            break
+                        message_count += 1
+                        logger.debug("Received message %d: %s", message_count, type(message).__name__)
+                        # Handle ResultMessage
+                        message_type = type(message)
+                        if message_type is ResultMessage:
+                            logger.info(f"ResultMessage subtype: {message.subtype}, data: {message.result}")
+                            # Handle slash command results (e.g., /clear, /help, /compact)
+                            result_text = message.result
+                            if result_text:
+                                logger.info(f"Slash command result: {result_text}")
+                                yield {
+                                    "type": "assistant",
+                                    "content": [{"type": "text", "text": result_text}],
+                                    "model": agent_config.get("model", "claude-sonnet-4-20250514")
+                                }
+                                # Persist alongside the rest of the turn's content
+                                await persist_assistant_blocks(
+                                    [{"type": "text", "text": result_text}],
+                                    model=agent_config.get("model")
+                                )
+                        # Handle SystemMessage
+                        if message_type is SystemMessage:
+                            logger.info("SystemMessage subtype: %s", message.subtype)
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug("SystemMessage data: %s", message.data)
+
+                            if message.subtype == 'init':
+                                # Capture session_id from SDK's init message (for new sessions)
+                                session_context["sdk_session_id"] = message.data.get('session_id')
+                                logger.info(f"Captured SDK session_id from init: {session_context['sdk_session_id']}")
+
+                                # For new sessions, now we can send session_start and store session
+                                if not is_resuming:
+                                    # Store client with SDK session_id
+                                    self._clients[session_context["sdk_session_id"]] = client
 
-                        # Handle SDK messages
-                        if item["source"] == "sdk":
-                            message = item["message"]
-                            message_count += 1
-                            logger.info(f"Received message {message_count}: {type(message).__name__}")
-                            # Handle ResultMessage
-                            if isinstance(message,ResultMessage):
-                                logger.info(f"ResultMessage subtype: {message.subtype}, data: {message.result}")
-                                # Handle slash command results (e.g., /clear, /help, /compact)
-                                result_text = message.result
-                                if result_text:
-                                    logger.info(f"Slash command result: {result_text}")
-                                    yield {
-                                        "type": "assistant",
-                                        "content": [{"type": "text", "text": result_text}],
-                                        "model": agent_config.get("model", "claude-sonnet-4-20250514")
-                                    }
-                                    # Add to assistant_content for saving
-                                    assistant_content.append({"type": "text", "text": result_text})
-                            # Handle SystemMessage
-                            if isinstance(message, SystemMessage):
-                                logger.info(f"SystemMessage subtype: {message.subtype}, data: {message.data}")
-
-                                if message.subtype == 'init':
-                                    # Capture session_id from SDK's init message (for new sessions)
-                                    session_context["sdk_session_id"] = message.data.get('session_id')
-                                    logger.info(f"Captured SDK session_id from init: {session_context['sdk_session_id']}")
-
-                                    # For new sessions, now we can send session_start and store session
-                                    if not is_resuming:
-                                        # Store client with SDK session_id
-                                        self._clients[session_context["sdk_session_id"]] = client
-
-                                        yield {
-                                            "type": "session_start",
-                                            "sessionId": session_context["sdk_session_id"],
-                                        }
-
-                                        # Store session with SDK session_id and work_dir for continuity
-                                        title = display_text[:50] + "..." if len(display_text) > 50 else display_text
-                                        await session_manager.store_session(session_context["sdk_session_id"], agent_id, title, work_dir=work_dir)
-
-                                        # Save user message to database with SDK session_id
-                                        # Store original content if multimodal, otherwise wrap text
-                                        user_content = content if content else [{"type": "text", "text": user_message}]
-                                        await self._save_message(
-                                            session_id=session_context["sdk_session_id"],
-                                            role="user",
-                                            content=user_content
-                                        )
-
-                                continue  # Don't format SystemMessage for output
-
-                            # Format and process the message
-                            formatted = await self._format_message(message, agent_config, session_context["sdk_session_id"])
-                            if formatted:
-                                logger.debug(f"Formatted message type: {formatted.get('type')}")
-
-                                # Collect content for saving
-                                if formatted.get('type') == 'assistant' and formatted.get('content'):
-                                    assistant_content.extend(formatted['content'])
-                                    assistant_model = formatted.get('model')
-
-                                yield formatted
-
-                                # If this is an AskUserQuestion, stop and wait for user input
-                                if formatted.get('type') == 'ask_user_question':
-                                    logger.info(f"AskUserQuestion detected, stopping to wait for user input")
-                                    # Save assistant message before returning
-                                    sdk_session = session_context.get("sdk_session_id")
-                                    if assistant_content and sdk_session:
-                                        await self._save_message(
-                                            session_id=sdk_session,
-                                            role="assistant",
-                                            content=assistant_content,
-                                            model=assistant_model
-                                        )
-                                    return
-
-                                # If this is a permission_request (from _format_message), stop and wait
-                                # This is a fallback in case the ToolResultBlock contains the prefix
-                                if formatted.get('type') == 'permission_request':
-                                    request_id = formatted.get('requestId')
-                                    logger.info(f"Permission request detected from message: {request_id}, stopping to wait for user decision")
-                                    # Save assistant message before returning
-                                    sdk_session = session_context.get("sdk_session_id")
-                                    if assistant_content and sdk_session:
-                                        await self._save_message(
-                                            session_id=sdk_session,
-                                            role="assistant",
-                                            content=assistant_content,
-                                            model=assistant_model
-                                        )
-                                    return
-
-                            # If it's a result message, include session info
-                            if isinstance(message, ResultMessage):
-                                logger.info(f"Conversation complete. Total messages: {message_count}")
-
-                                # Check if this was a slash command with no assistant response
-                                is_slash_command = display_text.strip().startswith('/') if display_text else False
-                                if is_slash_command and not assistant_content:
-                                    # Provide a default response for slash commands
-                                    command_name = display_text.strip().split()[0] if display_text else '/unknown'
-                                    default_response = f"Command `{command_name}` executed."
-                                    logger.info(f"Slash command with no content, adding default response: {default_response}")
                                     yield {
-                                        "type": "assistant",
-                                        "content": [{"type": "text", "text": default_response}],
-                                        "model": agent_config.get("model", "claude-sonnet-4-20250514")
+                                        "type": "session_start",
+                                        "sessionId": session_context["sdk_session_id"],
                                     }
-                                    assistant_content.append({"type": "text", "text": default_response})
 
-                                # Save assistant message
-                                if assistant_content and session_context["sdk_session_id"]:
+                                    # Store session with SDK session_id and work_dir for continuity
+                                    title = _make_title(display_text)
+                                    await session_manager.store_session(session_context["sdk_session_id"], agent_id, title, work_dir=work_dir)
+
+                                    # Save user message to database with SDK session_id
+                                    # Store original content if multimodal, otherwise wrap text
+                                    user_content = content if content else [{"type": "text", "text": user_message}]
                                     await self._save_message(
                                         session_id=session_context["sdk_session_id"],
-                                        role="assistant",
-                                        content=assistant_content,
-                                        model=assistant_model
+                                        role="user",
+                                        content=user_content
                                     )
 
+                            continue  # Don't format SystemMessage for output
+
+                        # Format and process the message
+                        formatted = await self._format_message(message, agent_config, session_context["sdk_session_id"])
+                        if formatted:
+                            logger.debug("Formatted message type: %s", formatted.get('type'))
+
+                            # Persist content incrementally instead of
+                            # buffering the whole turn for one final write
+                            if formatted.get('type') == 'assistant' and formatted.get('content'):
+                                await persist_assistant_blocks(formatted['content'], model=formatted.get('model'))
+
+                            yield formatted
+
+                            # If this is an AskUserQuestion, stop and wait for user input
+                            if formatted.get('type') == 'ask_user_question':
+                                logger.info(f"AskUserQuestion detected, stopping to wait for user input")
+                                # Assistant blocks are already persisted
+                                # incrementally; finally flushes the writer
+                                return
+
+                            # If this is a permission_request (from _format_message), stop and wait
+                            # This is a fallback in case the ToolResultBlock contains the prefix
+                            if formatted.get('type') == 'permission_request':
+                                request_id = formatted.get('requestId')
+                                logger.info(f"Permission request detected from message: {request_id}, stopping to wait for user decision")
+                                # Assistant blocks are already persisted
+                                # incrementally; finally flushes the writer
+                                return
+
+                        # If it's a result message, include session info
+                        if message_type is ResultMessage:
+                            logger.info(f"Conversation complete. Total messages: {message_count}")
+
+                            # Check if this was a slash command with no assistant response
+                            is_slash_command = display_text.strip().startswith('/') if display_text else False
+                            if is_slash_command and assistant_message_id is None:
+                                # Provide a default response for slash commands
+                                command_name = display_text.strip().split()[0] if display_text else '/unknown'
+                                default_response = f"Command `{command_name}` executed."
+                                logger.info(f"Slash command with no content, adding default response: {default_response}")
                                 yield {
-                                    "type": "result",
-                                    "session_id": session_context["sdk_session_id"],
-                                    "duration_ms": getattr(message, 'duration_ms', 0),
-                                    "total_cost_usd": getattr(message, 'total_cost_usd', None),
-                                    "num_turns": getattr(message, 'num_turns', 1),
+                                    "type": "assistant",
+                                    "content": [{"type": "text", "text": default_response}],
+                                    "model": agent_config.get("model", "claude-sonnet-4-20250514")
                                 }
-                finally:
-                    # Cancel background tasks if they exist
-                    if sdk_reader_task and not sdk_reader_task.done():
-                        sdk_reader_task.cancel()
-                        try:
-                            await sdk_reader_task
-                        except asyncio.CancelledError:
-                            pass
-                        logger.debug("SDK reader task cancelled")
+                                await persist_assistant_blocks(
+                                    [{"type": "text", "text": default_response}],
+                                    model=agent_config.get("model")
+                                )
 
-                    if forwarder_task and not forwarder_task.done():
-                        forwarder_task.cancel()
-                        try:
-                            await forwarder_task
-                        except asyncio.CancelledError:
-                            pass
-                        logger.debug("Forwarder task cancelled")
+                            yield {
+                                "type": "result",
+                                "session_id": session_context["sdk_session_id"],
+                                "duration_ms": message.duration_ms,
+                                "total_cost_usd": message.total_cost_usd,
+                                "num_turns": message.num_turns,
+                            }
+                finally:
+                    # Cancel whichever in-flight futures are still pending
+                    for in_flight_future in (sdk_next, perm_next):
+                        if in_flight_future and not in_flight_future.done():
+                            in_flight_future.cancel()
+                            try:
+                                await in_flight_future
+                            except asyncio.CancelledError:
+                                pass
+                    logger.debug("In-flight futures cancelled")
 
-                    # Remove client from tracking when done
+                    # Remove client and permission queue tracking when done
                     if session_context["sdk_session_id"]:
                         self._clients.pop(session_context["sdk_session_id"], None)
+                        discard_permission_request_queue(session_context["sdk_session_id"])
+
+                    # Make sure batched messages hit the DB before the
+                    # stream ends (early returns included)
+                    await self.flush_messages()
 
         except Exception as e:
             import traceback
@@ -1254,65 +1882,43 @@ class AgentManager:
     async def _format_message(self, message: Any, agent_config: dict, session_id: Optional[str] = None) -> Optional[dict]:
         """Format SDK message to API response format."""
 
-        if isinstance(message, AssistantMessage):
-            content_blocks = []
-
-            for block in message.content:
-                if isinstance(block, TextBlock):
-                    content_blocks.append({
-                        "type": "text",
-                        "text": block.text
-                    })
-                elif isinstance(block, ToolUseBlock):
-                    # Check if this is an AskUserQuestion tool call
-                    if block.name == "AskUserQuestion":
-                        # Return special ask_user_question event
-                        questions = block.input.get("questions", [])
-                        event = {
-                            "type": "ask_user_question",
-                            "toolUseId": block.id,
-                            "questions": questions
-                        }
-                        # Include session_id so frontend can continue the conversation
-                        if session_id:
-                            event["sessionId"] = session_id
-                        return event
-                    # Note: Dangerous Bash command detection is handled by the human_approval_hook
-                    # which runs BEFORE execution and can actually block it. Detection here
-                    # would be too late - the SDK has already decided to execute the tool.
-                    # The hook denial is detected in ToolResultBlock below.
-
-                    # Regular tool use block
-                    content_blocks.append({
-                        "type": "tool_use",
-                        "id": block.id,
-                        "name": block.name,
-                        "input": block.input
-                    })
-                elif isinstance(block, ToolResultBlock):
-                    block_content = str(block.content) if block.content else None
-
-                    # Note: Permission request handling is now done via the queue mechanism
-                    # and emitted directly in the message loop before formatting.
-                    # This ToolResultBlock will just contain the normal tool output.
-
-                    content_blocks.append({
-                        "type": "tool_result",
-                        "tool_use_id": block.tool_use_id,
-                        "content": block_content,
-                        "is_error": getattr(block, 'is_error', False)
-                    })
+        # Only AssistantMessage produces output here; ResultMessage is
+        # handled separately in the loop to include session_id. SDK message
+        # classes are concrete dataclasses, so an exact type check replaces
+        # the isinstance chain (no MRO walk per streamed message).
+        if type(message) is not AssistantMessage:
+            return None
 
-            if content_blocks:
-                return {
-                    "type": "assistant",
-                    "content": content_blocks,
-                    "model": getattr(message, 'model', agent_config.get("model", "claude-sonnet-4-20250514"))
+        content_blocks = []
+        for block in message.content:
+            formatter = _BLOCK_FORMATTERS.get(type(block))
+            if formatter is None:
+                continue
+            # Check if this is an AskUserQuestion tool call
+            if type(block) is ToolUseBlock and block.name == "AskUserQuestion":
+                # Return special ask_user_question event
+                questions = block.input.get("questions", [])
+                event = {
+                    "type": "ask_user_question",
+                    "toolUseId": block.id,
+                    "questions": questions
                 }
-
-        elif isinstance(message, ResultMessage):
-            # Return None here, we handle ResultMessage separately to include session_id
-            return None
+                # Include session_id so frontend can continue the conversation
+                if session_id:
+                    event["sessionId"] = session_id
+                return event
+            # Note: Dangerous Bash command detection is handled by the human_approval_hook
+            # which runs BEFORE execution and can actually block it. Detection here
+            # would be too late - the SDK has already decided to execute the tool.
+            # The hook denial is detected in ToolResultBlock formatting.
+            content_blocks.append(formatter(block))
+
+        if content_blocks:
+            return {
+                "type": "assistant",
+                "content": content_blocks,
+                "model": getattr(message, 'model', agent_config.get("model", "claude-sonnet-4-20250514"))
+            }
 
         return None
 
@@ -1342,7 +1948,7 @@ class AgentManager:
             Formatted messages from the agent
         """
         # Get agent config
-        agent_config = await db.agents.get(agent_id)
+        agent_config = await self._get_agent_config(agent_id)
         if not agent_config:
             yield {
                 "type": "error",
@@ -1359,14 +1965,15 @@ class AgentManager:
             agent_config['add_dirs'] = [session_info.work_dir]
             logger.info(f"Restored work_dir from session: {session_info.work_dir}")
 
-        # Configure Claude environment variables
-        await _configure_claude_environment()
+        # Build the Claude environment overlay for the CLI subprocess
+        claude_env = await _configure_claude_environment()
 
         # Build options with resume to continue the session
-        options = await self._build_options(agent_config, enable_skills, enable_mcp, resume_session_id=session_id)
+        options = await self._build_options(agent_config, enable_skills, enable_mcp, resume_session_id=session_id, claude_env=claude_env)
 
-        # Format answers as a user message
-        answer_message = json.dumps({"answers": answers}, indent=2)
+        # Format answers as a compact user message; pretty-printing only
+        # inflates what gets sent to the SDK and persisted to the DB
+        answer_message = json.dumps({"answers": answers}, separators=(",", ":"), ensure_ascii=False)
 
         # Save user answer to database
         await self._save_message(
@@ -1375,10 +1982,27 @@ class AgentManager:
             content=[{"type": "text", "text": f"User answers:\n{answer_message}"}]
         )
 
-        # Collect assistant response content for saving
-        assistant_content = []
-        assistant_model = None
-        forwarder_task = None  # Initialize before try block for finally clause
+        # Stream assistant blocks to the DB incrementally (create the row on
+        # the first blocks, append after) instead of accumulating the whole
+        # turn in a growing list for one big save at the end
+        assistant_message_id = None
+
+        async def persist_assistant_blocks(blocks: list[dict], model: Optional[str] = None):
+            nonlocal assistant_message_id
+            if assistant_message_id is None:
+                saved = await self._save_message(
+                    session_id=session_id,
+                    role="assistant",
+                    content=list(blocks),
+                    model=model,
+                )
+                assistant_message_id = saved["id"]
+            else:
+                await self._append_message_blocks(assistant_message_id, blocks)
+
+        # Initialize in-flight futures before try block to ensure they exist in finally
+        sdk_next = None
+        perm_next = None
 
         try:
             logger.info(f"Creating ClaudeSDKClient for answer continuation with resume={session_id}...")
@@ -1390,91 +2014,73 @@ class AgentManager:
                 await client.query(answer_message)
                 logger.info(f"Answer sent, waiting for response...")
 
-                # Create event queue for this conversation to handle permission requests
-                event_queue = asyncio.Queue()
+                # Race the next SDK message against this session's permission
+                # queue directly (session_id is known upfront here), instead
+                # of a forwarder task draining it into an intermediate queue.
+                perm_queue = get_permission_request_queue(session_id)
+                message_count = 0
+                sdk_iter = client.receive_response().__aiter__()
+                sdk_next = asyncio.ensure_future(anext(sdk_iter))
+                perm_next = asyncio.ensure_future(perm_queue.get())
 
-                # Background task to forward permission requests for this session
-                async def permission_request_forwarder():
-                    """Monitor global queue and forward requests for this session."""
-                    try:
-                        while True:
-                            request = await _permission_request_queue.get()
-                            if request.get("sessionId") == session_id:
-                                logger.info(f"Forwarding permission request {request.get('requestId')} to event queue")
-                                await event_queue.put({"type": "permission_request", **request})
-                            else:
-                                await _permission_request_queue.put(request)
-                                await asyncio.sleep(0.01)
-                    except asyncio.CancelledError:
-                        logger.debug("Permission request forwarder cancelled")
-                        raise
+                while True:
+                    done, _ = await asyncio.wait({sdk_next, perm_next}, return_when=asyncio.FIRST_COMPLETED)
 
-                # Start the forwarder task
-                forwarder_task = asyncio.create_task(permission_request_forwarder())
+                    # Handle permission requests
+                    if perm_next in done:
+                        request = perm_next.result()
+                        perm_next = asyncio.ensure_future(perm_queue.get())
+                        logger.info(f"Emitting permission request: {request.get('requestId')}")
+                        yield {"type": "permission_request", **request}
+
+                    if sdk_next not in done:
+                        continue
+
+                    try:
+                        message = sdk_next.result()
+                    except StopAsyncIteration:
+                        logger.info("SDK iterator finished, exiting message loop")
+                        break
+                    sdk_next = asyncio.ensure_future(anext(sdk_iter))
 
-                message_count = 0
-                async for message in client.receive_response():
                     message_count += 1
-                    logger.debug(f"Received message {message_count}: {type(message).__name__}")
+                    message_type = type(message)
+                    logger.debug("Received message %d: %s", message_count, message_type.__name__)
 
                     # Skip SystemMessage (init message)
-                    if isinstance(message, SystemMessage):
-                        logger.debug(f"Skipping SystemMessage with subtype: {message.subtype}")
+                    if message_type is SystemMessage:
+                        logger.debug("Skipping SystemMessage with subtype: %s", message.subtype)
                         continue
 
-                    # Check for queued permission requests BEFORE formatting message
-                    while not event_queue.empty():
-                        try:
-                            queued_event = event_queue.get_nowait()
-                            logger.info(f"Emitting queued permission request: {queued_event.get('requestId')}")
-                            yield queued_event
-                        except asyncio.QueueEmpty:
-                            break
-
                     formatted = await self._format_message(message, agent_config, session_id)
                     if formatted:
-                        logger.debug(f"Formatted message type: {formatted.get('type')}")
+                        logger.debug("Formatted message type: %s", formatted.get('type'))
 
-                        # Collect content for saving
+                        # Persist assistant blocks as they stream in
                         if formatted.get('type') == 'assistant' and formatted.get('content'):
-                            assistant_content.extend(formatted['content'])
-                            assistant_model = formatted.get('model')
+                            await persist_assistant_blocks(formatted['content'], model=formatted.get('model'))
 
                         yield formatted
 
                         # If this is an AskUserQuestion, stop and wait for user input
                         if formatted.get('type') == 'ask_user_question':
                             logger.info(f"AskUserQuestion detected, stopping to wait for user input")
-                            if assistant_content:
-                                await self._save_message(
-                                    session_id=session_id,
-                                    role="assistant",
-                                    content=assistant_content,
-                                    model=assistant_model
-                                )
+                            # Assistant blocks are already persisted
+                            # incrementally; finally flushes the writer
                             return
 
                         # Note: permission_request type shouldn't appear here anymore
                         # The hook now suspends execution until user responds, then continues naturally
 
-                    if isinstance(message, ResultMessage):
+                    if message_type is ResultMessage:
                         logger.info(f"Conversation continued successfully. Total messages: {message_count}")
 
-                        # Save assistant message
-                        if assistant_content:
-                            await self._save_message(
-                                session_id=session_id,
-                                role="assistant",
-                                content=assistant_content,
-                                model=assistant_model
-                            )
-
                         yield {
                             "type": "result",
                             "session_id": session_id,
-                            "duration_ms": getattr(message, 'duration_ms', 0),
-                            "total_cost_usd": getattr(message, 'total_cost_usd', None),
-                            "num_turns": getattr(message, 'num_turns', 1),
+                            "duration_ms": message.duration_ms,
+                            "total_cost_usd": message.total_cost_usd,
+                            "num_turns": message.num_turns,
                         }
 
         except Exception as e:
@@ -1488,16 +2094,18 @@ class AgentManager:
                 "detail": error_traceback,
             }
         finally:
-            # Cancel forwarder task if it exists
-            if forwarder_task and not forwarder_task.done():
-                forwarder_task.cancel()
-                try:
-                    await forwarder_task
-                except asyncio.CancelledError:
-                    pass
-                logger.debug("Forwarder task cancelled")
+            # Cancel whichever in-flight futures are still pending
+            for in_flight_future in (sdk_next, perm_next):
+                if in_flight_future and not in_flight_future.done():
+                    in_flight_future.cancel()
+                    try:
+                        await in_flight_future
+                    except asyncio.CancelledError:
+                        pass
 
             self._clients.pop(session_id, None)
+            discard_permission_request_queue(session_id)
+            await self.flush_messages()
 
     async def continue_with_permission(
         self,
@@ -1524,7 +2132,7 @@ class AgentManager:
             Formatted messages from the agent
         """
         # Get agent config
-        agent_config = await db.agents.get(agent_id)
+        agent_config = await self._get_agent_config(agent_id)
         if not agent_config:
             yield {
                 "type": "error",
@@ -1532,8 +2140,15 @@ class AgentManager:
             }
             return
 
-        # Get permission request details
-        permission_request = await db.permission_requests.get(request_id)
+        # Record the decision and read the request back in one round-trip;
+        # update returns the patched row (None if the id doesn't exist), and
+        # the fields consumed below (tool_input, session_id) aren't touched
+        # by the patch
+        permission_request = await db.permission_requests.update(request_id, {
+            "status": decision,
+            "decided_at": _iso_now(),
+            "user_feedback": feedback,
+        })
         if not permission_request:
             yield {
                 "type": "error",
@@ -1541,27 +2156,12 @@ class AgentManager:
             }
             return
 
-        # Update permission request status
-        await db.permission_requests.update(request_id, {
-            "status": decision,
-            "decided_at": datetime.now().isoformat(),
-            "user_feedback": feedback,
-        })
-
         logger.info(f"Permission decision for request {request_id}: {decision}")
         logger.info(f"Continuing conversation for agent {agent_id}, session {session_id}")
 
-        # Restore work_dir from session for continuity
-        session_info = await session_manager.get_session(session_id)
-        if session_info and session_info.work_dir:
-            agent_config['add_dirs'] = [session_info.work_dir]
-            logger.info(f"Restored work_dir from session: {session_info.work_dir}")
-
-        # Configure Claude environment variables
-        await _configure_claude_environment()
-
-        # Build options with resume to continue the session
-        options = await self._build_options(agent_config, enable_skills, enable_mcp, resume_session_id=session_id)
+        # No SDK client is created here: the original stream's hook is
+        # suspended waiting on this decision and resumes in place, so there
+        # is no options/env to build and no conversation history to replay.
 
         # Parse the original command from permission request
         tool_input = permission_request.get("tool_input", "{}")
@@ -1578,7 +2178,7 @@ class AgentManager:
         if decision == "approve":
             decision_message = f"User APPROVED the command. Please proceed with executing: {command}"
             # Store this approval for the hook to check - use the session_id from permission_request
-            _approved_commands.setdefault(perm_session_id, set()).add(_hash_command(command))
+            approve_command(perm_session_id, command)
         else:
             reason = feedback if feedback else "User denied the command"
             decision_message = f"User DENIED the command '{command}'. Reason: {reason}. Please acknowledge this and continue without executing that command."
@@ -1594,6 +2194,8 @@ class AgentManager:
             role="user",
             content=[{"type": "text", "text": decision_message}]
         )
+        # This stream closes right away, so force the batched write out now
+        await self.flush_messages()
 
         # The original stream will continue processing and send results back
         # Just return a simple acknowledgment here to close this new stream
@@ -1605,14 +2207,22 @@ class AgentManager:
         logger.info(f"Permission decision processed, original stream will handle execution")
 
     async def disconnect_all(self):
-        """Disconnect all active clients."""
-        for session_id, client in list(self._clients.items()):
+        """Disconnect all active clients concurrently."""
+
+        async def interrupt_one(session_id, client):
             try:
                 logger.info(f"Disconnecting client for session {session_id}")
-                # Try to interrupt if running
-                await client.interrupt()
+                # Try to interrupt if running; bound the wait so one stuck
+                # client can't stall shutdown
+                await asyncio.wait_for(client.interrupt(), timeout=5.0)
             except Exception as e:
                 logger.error(f"Error disconnecting client {session_id}: {e}")
+
+        clients = list(self._clients.items())
+        if clients:
+            # Interrupts are independent I/O; overlapping them makes
+            # shutdown O(slowest client) instead of O(sum)
+            await asyncio.gather(*(interrupt_one(sid, c) for sid, c in clients))
         self._clients.clear()
 
     async def interrupt_session(self, session_id: str) -> dict:
@@ -1680,47 +2290,17 @@ class AgentManager:
             prompt = user_message
         else:
             # Initial skill creation request
-            prompt = f"""Please create a new skill with the following specifications:
-
-**Skill Name:** {skill_name}
-**Skill Description:** {skill_description}
-
-Use the skill-creator skill (invoke /skill-creator) to guide your skill creation process. Follow the workflow:
-1. Understand the skill requirements from the description above
-2. Plan reusable contents (scripts, references, assets) if needed
-3. Initialize the skill using the init_skill.py script
-4. Edit SKILL.md and create any necessary files
-5. Test any scripts you create
-
-Create the skill in the `.claude/skills/` directory within the current workspace."""
+            prompt = _SKILL_CREATOR_PROMPT_TMPL.format(name=skill_name, desc=skill_description)
 
         # Build system prompt for skill creator agent
-        system_prompt = f"""You are a Skill Creator Agent specialized in creating Claude Code skills.
-
-Your task is to help users create high-quality skills that extend Claude's capabilities.
-
-IMPORTANT GUIDELINES:
-1. Always use the skill-creator skill (invoke /skill-creator) to get guidance on skill creation best practices
-2. Follow the skill creation workflow from the skill-creator skill
-3. Create skills in the `.claude/skills/` directory
-4. Ensure SKILL.md has proper YAML frontmatter with name and description
-5. Keep skills concise and focused - only include what Claude needs
-6. Test any scripts you create before completing
-
-The skill-creator skill provides comprehensive guidance on:
-- Skill anatomy and structure
-- Progressive disclosure design
-- When to use scripts, references, and assets
-- Best practices for SKILL.md content
-
-Current task: Create a skill named "{skill_name}" that {skill_description}"""
+        system_prompt = _SKILL_CREATOR_SYSTEM_PROMPT_TMPL.format(name=skill_name, desc=skill_description)
 
         # Create temporary agent config for skill creation
         agent_config = {
             "name": f"skill-creator-{session_id[:8] if session_id else 'new'}",
             "description": "Temporary agent for skill creation",
             "system_prompt": system_prompt,
-            "allowed_tools": ["Bash", "Read", "Write", "Edit", "Glob", "Grep", "Skill","TodoWrite","Task"],
+            "allowed_tools": list(_SKILL_CREATOR_TOOLS),
             "permission_mode": "bypassPermissions",
             "working_directory": settings.agent_workspace_dir,
             "global_user_mode": False,  # Use workspace dir, not home dir
@@ -1738,15 +2318,16 @@ Current task: Create a skill named "{skill_name}" that {skill_description}"""
                 "type": "session_start",
                 "sessionId": session_id,
             }
-            # Store session for resumed conversations
+            # Store session for resumed conversations (the fixed title means
+            # this skips the DB upsert once the session is cached)
             title = f"Creating skill: {skill_name}"
-            await session_manager.store_session(session_id, "skill-creator", title)
+            await session_manager.touch_session(session_id, "skill-creator", title)
 
-        # Configure Claude environment variables
-        await _configure_claude_environment()
+        # Build the Claude environment overlay for the CLI subprocess
+        claude_env = await _configure_claude_environment()
 
         # Build options with resume if continuing
-        options = await self._build_options(agent_config, enable_skills=True, enable_mcp=False, resume_session_id=session_id if is_resuming else None)
+        options = await self._build_options(agent_config, enable_skills=True, enable_mcp=False, resume_session_id=session_id if is_resuming else None, claude_env=claude_env)
         logger.info(f"Skill creator options - allowed_tools: {options.allowed_tools}, resume: {session_id if is_resuming else None}")
         logger.info(f"Working directory: {options.cwd}")
 
@@ -1770,10 +2351,11 @@ Current task: Create a skill named "{skill_name}" that {skill_description}"""
                     message_count = 0
                     async for message in client.receive_response():
                         message_count += 1
-                        logger.debug(f"Received message {message_count}: {type(message).__name__}")
+                        message_type = type(message)
+                        logger.debug("Received message %d: %s", message_count, message_type.__name__)
 
                         # Capture session_id from SDK's init message (for new sessions)
-                        if isinstance(message, SystemMessage) and message.subtype == 'init':
+                        if message_type is SystemMessage and message.subtype == 'init':
                             sdk_session_id = message.data.get('session_id')
                             logger.info(f"Captured SDK session_id from init: {sdk_session_id}")
 
@@ -1794,7 +2376,7 @@ Current task: Create a skill named "{skill_name}" that {skill_description}"""
 
                         formatted = await self._format_message(message, agent_config, sdk_session_id)
                         if formatted:
-                            logger.debug(f"Formatted message type: {formatted.get('type')}")
+                            logger.debug("Formatted message type: %s", formatted.get('type'))
                             yield formatted
 
                             # If this is an AskUserQuestion, stop and wait for user input
@@ -1802,14 +2384,14 @@ Current task: Create a skill named "{skill_name}" that {skill_description}"""
                                 logger.info(f"AskUserQuestion detected, stopping to wait for user input")
                                 return
 
-                        if isinstance(message, ResultMessage):
+                        if message_type is ResultMessage:
                             logger.info(f"Skill creation conversation complete. Total messages: {message_count}")
                             yield {
                                 "type": "result",
                                 "session_id": sdk_session_id,
-                                "duration_ms": getattr(message, 'duration_ms', 0),
-                                "total_cost_usd": getattr(message, 'total_cost_usd', None),
-                                "num_turns": getattr(message, 'num_turns', 1),
+                                "duration_ms": message.duration_ms,
+                                "total_cost_usd": message.total_cost_usd,
+                                "num_turns": message.num_turns,
                                 "skill_name": skill_name,
                             }
                 finally:
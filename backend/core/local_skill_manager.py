@@ -1,19 +1,52 @@
 """Local skill storage and Git-based version management for desktop application."""
 import asyncio
+import io
+import os
 import zipfile
 import shutil
 import re
 import subprocess
+import sys
 import logging
 from pathlib import Path
 from dataclasses import dataclass, field
 from typing import Optional
 from datetime import datetime
+from uuid import uuid4
 
 from config import settings
 
 logger = logging.getLogger(__name__)
 
+# SKILL.md metadata patterns, compiled once. The fields live at the top of
+# the file, so extraction reads a bounded header slice instead of whole
+# (potentially multi-MB) skill documents.
+_SKILL_MD_HEADER_BYTES = 16384
+_SKILL_NAME_RE = re.compile(r'^#\s+(.+)$', re.MULTILINE)
+_SKILL_DESC_RE = re.compile(r'^#[^\n]+\n+([^\n#]+)', re.MULTILINE)
+_SKILL_VERSION_RE = re.compile(r'[Vv]ersion[:\s]+([0-9.]+)')
+
+
+def _decode_git_output(data: Optional[bytes]) -> str:
+    """Decode raw git output; commit text is not guaranteed valid UTF-8."""
+    return data.decode("utf-8", errors="replace") if data else ""
+
+
+# Platform-specific application data directory, resolved once at import.
+# sys.platform is an interpreter constant, so this costs nothing compared
+# to calling platform.system() (a uname round-trip) per instantiation.
+if sys.platform == "darwin":
+    _DEFAULT_DATA_DIR = Path.home() / "Library" / "Application Support" / "Owork"
+elif sys.platform == "win32":
+    _DEFAULT_DATA_DIR = Path.home() / "AppData" / "Local" / "Owork"
+else:
+    _DEFAULT_DATA_DIR = Path.home() / ".local" / "share" / "owork"
+
+
+# One line of "git log --pretty=format:%H|%s|%an|%ci" output, matched
+# against the raw bytes so history parsing needs no per-line split lists
+_GIT_LOG_LINE_RE = re.compile(rb'([0-9a-f]{40})\|([^|\n]*)\|([^|\n]*)\|([^\n]+)')
+
 
 @dataclass
 class GitInfo:
@@ -46,6 +79,15 @@ class SkillMetadata:
     author: str = "unknown"
 
 
+@dataclass
+class SkillSummary:
+    """Everything the skills list view needs for one skill."""
+    name: str
+    path: str
+    metadata: SkillMetadata
+    git_info: GitInfo
+
+
 @dataclass
 class InstallResult:
     """Result of skill installation."""
@@ -79,17 +121,13 @@ class LocalSkillManager:
         Args:
             data_dir: Base data directory. If None, uses platform-specific default.
         """
-        if data_dir is None:
-            import platform
-            if platform.system() == "Darwin":
-                data_dir = Path.home() / "Library" / "Application Support" / "Owork"
-            elif platform.system() == "Windows":
-                data_dir = Path.home() / "AppData" / "Local" / "Owork"
-            else:
-                data_dir = Path.home() / ".local" / "share" / "owork"
-
-        self.data_dir = data_dir
-        self.skills_dir = data_dir / "skills"
+        self.data_dir = data_dir if data_dir is not None else _DEFAULT_DATA_DIR
+        self.skills_dir = self.data_dir / "skills"
+        # Resolve git once; forking "git --version" per install just to
+        # probe availability is wasted exec time
+        self._git_path: Optional[str] = shutil.which("git")
+        # get_git_info results keyed on .git mtimes; see _git_info_cache_key
+        self._git_info_cache: dict[Path, tuple[float, GitInfo]] = {}
         self._ensure_dirs()
 
     def _ensure_dirs(self):
@@ -102,46 +140,111 @@ class LocalSkillManager:
         cwd: Optional[Path] = None,
         check: bool = True
     ) -> subprocess.CompletedProcess:
-        """Run a git command asynchronously."""
-        return await asyncio.to_thread(
-            subprocess.run,
-            ["git"] + args,
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            check=check
+        """Run a git command asynchronously.
+
+        The child is spawned through the event loop's own subprocess
+        support rather than asyncio.to_thread(subprocess.run, ...), so a
+        burst of concurrent clones does not tie up default-executor
+        threads for the full duration of each network transfer.
+
+        The repository is addressed with ``git -C`` instead of ``cwd=``
+        (saves the child an extra chdir), and output stays as raw bytes;
+        callers decode only the streams they actually read via
+        :func:`_decode_git_output`.
+        """
+        argv = [self._git_path or "git"]
+        if cwd is not None:
+            argv += ["-C", str(cwd)]
+        argv += args
+        proc = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
         )
+        stdout, stderr = await proc.communicate()
+        if check and proc.returncode != 0:
+            raise subprocess.CalledProcessError(
+                proc.returncode, argv, output=stdout, stderr=stderr
+            )
+        return subprocess.CompletedProcess(argv, proc.returncode, stdout, stderr)
 
     def _is_git_installed(self) -> bool:
-        """Check if git is installed."""
-        try:
-            result = subprocess.run(
-                ["git", "--version"],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            return result.returncode == 0
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
+        """Check if git is installed (resolved once at construction)."""
+        return self._git_path is not None
+
+    @staticmethod
+    def _is_git_repo(skill_dir: Path) -> bool:
+        """Cheap repo probe for guard clauses: one stat, no subprocesses."""
+        return (skill_dir / ".git").exists()
+
+    @staticmethod
+    async def _rmtree(path: Path) -> None:
+        """Remove a directory tree without blocking the event loop.
+
+        A skill directory can hold thousands of files (node_modules etc.),
+        and a synchronous rmtree would stall every other request for the
+        duration.
+        """
+        await asyncio.to_thread(shutil.rmtree, path, ignore_errors=True)
 
     def scan_local_skills(self) -> dict[str, Path]:
         """Scan local skills directory and return dict of skill_name -> path."""
         self._ensure_dirs()
         skills = {}
 
-        for item in self.skills_dir.iterdir():
-            if item.is_dir() and not item.name.startswith('.'):
+        # scandir hands back DirEntry objects whose is_dir() reuses the
+        # stat from the directory read, so the scan costs one stat per
+        # skill (the SKILL.md probe) instead of three
+        with os.scandir(self.skills_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_dir(follow_symlinks=False):
+                    continue
                 # Check if it has SKILL.md (valid skill directory)
-                skill_md = item / "SKILL.md"
-                if skill_md.exists():
-                    skills[item.name] = item
+                if os.path.lexists(os.path.join(entry.path, "SKILL.md")):
+                    skills[entry.name] = Path(entry.path)
                 else:
-                    logger.warning(f"Skipping directory without SKILL.md: {item.name}")
+                    logger.warning(f"Skipping directory without SKILL.md: {entry.name}")
 
         logger.info(f"Found {len(skills)} local skills: {list(skills.keys())}")
         return skills
 
+    async def list_skills_full(self, concurrency: int = 8) -> list[SkillSummary]:
+        """Scan skills and load metadata plus git info for each, concurrently.
+
+        The skills page needs the directory scan, the SKILL.md parse and
+        the git probe for every skill; doing them one after another makes
+        the page cost the sum of all of it. Fan the per-skill work out
+        instead — the SKILL.md reads run on worker threads while the git
+        subprocesses overlap — so the listing costs roughly one skill's
+        latency, bounded by the semaphore.
+
+        Args:
+            concurrency: Maximum number of skills loaded at the same time
+
+        Returns:
+            List of SkillSummary, sorted by skill name
+        """
+        skill_dirs = await asyncio.to_thread(self.scan_local_skills)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def load(name: str, path: Path) -> SkillSummary:
+            async with semaphore:
+                metadata, git_info = await asyncio.gather(
+                    asyncio.to_thread(self.extract_skill_metadata, path),
+                    self.get_git_info(path),
+                )
+                return SkillSummary(
+                    name=name,
+                    path=str(path),
+                    metadata=metadata,
+                    git_info=git_info,
+                )
+
+        summaries = await asyncio.gather(
+            *(load(name, path) for name, path in sorted(skill_dirs.items()))
+        )
+        return list(summaries)
+
     def extract_skill_metadata(self, skill_dir: Path) -> SkillMetadata:
         """Extract metadata from SKILL.md file."""
         skill_md = skill_dir / "SKILL.md"
@@ -152,20 +255,21 @@ class LocalSkillManager:
         author = "unknown"
 
         if skill_md.exists():
-            content = skill_md.read_text(encoding='utf-8')
+            with skill_md.open('rb') as f:
+                content = f.read(_SKILL_MD_HEADER_BYTES).decode('utf-8', errors='ignore')
 
             # Try to extract name from first heading
-            name_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
+            name_match = _SKILL_NAME_RE.search(content)
             if name_match:
                 name = name_match.group(1).strip()
 
             # Try to extract description (first paragraph after heading)
-            desc_match = re.search(r'^#[^\n]+\n+([^\n#]+)', content, re.MULTILINE)
+            desc_match = _SKILL_DESC_RE.search(content)
             if desc_match:
                 description = desc_match.group(1).strip()
 
             # Try to extract version
-            version_match = re.search(r'[Vv]ersion[:\s]+([0-9.]+)', content)
+            version_match = _SKILL_VERSION_RE.search(content)
             if version_match:
                 version = version_match.group(1)
 
@@ -176,73 +280,141 @@ class LocalSkillManager:
             author=author
         )
 
+    @staticmethod
+    def _read_origin_url(git_dir: Path) -> Optional[str]:
+        """Read the origin remote URL from .git/config without a subprocess."""
+        try:
+            in_origin = False
+            for line in (git_dir / "config").read_text(encoding="utf-8").splitlines():
+                stripped = line.strip()
+                if stripped.startswith("["):
+                    in_origin = stripped.replace("'", '"') == '[remote "origin"]'
+                elif in_origin:
+                    key, sep, value = stripped.partition("=")
+                    if sep and key.strip() == "url":
+                        return value.strip()
+        except OSError:
+            pass
+        return None
+
+    @staticmethod
+    def _git_info_cache_key(git_dir: Path) -> float:
+        """Cache key for get_git_info: newest mtime of .git/HEAD and .git/index.
+
+        Both files are touched by any commit, checkout, pull or stash, so
+        a repeated read with the same key can safely reuse the previous
+        answer without forking git again.
+        """
+        key = 0.0
+        for name in ("HEAD", "index"):
+            try:
+                key = max(key, (git_dir / name).stat().st_mtime)
+            except OSError:
+                pass
+        return key
+
+    def _invalidate_git_info(self, skill_dir: Path) -> None:
+        """Drop the cached git info for a skill after mutating its repo."""
+        self._git_info_cache.pop(skill_dir, None)
+
     async def get_git_info(self, skill_dir: Path) -> GitInfo:
-        """Get Git repository information for a skill directory."""
+        """Get Git repository information for a skill directory.
+
+        Results are cached per directory and reused while the repository
+        is unchanged (two stat calls instead of two git forks); the list,
+        detail and version views all hit this on the same skills.
+        """
         git_dir = skill_dir / ".git"
         if not git_dir.exists():
             return GitInfo(is_git_repo=False)
 
+        cache_key = self._git_info_cache_key(git_dir)
+        cached = self._git_info_cache.get(skill_dir)
+        if cached is not None and cached[0] == cache_key:
+            return cached[1]
+
         info = GitInfo(is_git_repo=True)
 
         try:
-            # Get remote URL
-            result = await self._run_git_command(
-                ["remote", "get-url", "origin"],
-                cwd=skill_dir,
-                check=False
+            # Forking git dominates the cost of these queries, so collapse
+            # the six separate calls into two that together report
+            # everything: one log for the HEAD commit fields, one status
+            # for branch + dirtiness. They are independent, so run them
+            # concurrently.
+            log_result, status_result = await asyncio.gather(
+                self._run_git_command(
+                    ["log", "-1", "--pretty=%H%x1f%s%x1f%ci"],
+                    cwd=skill_dir,
+                    check=False
+                ),
+                self._run_git_command(
+                    ["status", "--porcelain", "--branch"],
+                    cwd=skill_dir,
+                    check=False
+                ),
             )
-            if result.returncode == 0:
-                info.remote_url = result.stdout.strip()
 
-            # Get current branch
-            result = await self._run_git_command(
-                ["rev-parse", "--abbrev-ref", "HEAD"],
-                cwd=skill_dir,
-                check=False
-            )
-            if result.returncode == 0:
-                info.current_branch = result.stdout.strip()
+            if log_result.returncode == 0:
+                parts = _decode_git_output(log_result.stdout).strip().split("\x1f")
+                if len(parts) == 3:
+                    info.current_commit = parts[0][:8]
+                    info.commit_message = parts[1]
+                    info.commit_date = parts[2]
+
+            if status_result.returncode == 0:
+                status_out = _decode_git_output(status_result.stdout)
+                header, _, entries = status_out.partition("\n")
+                # "## main...origin/main" or "## HEAD (no branch)" when detached
+                if header.startswith("## "):
+                    branch = header[3:].split("...", 1)[0].strip()
+                    if branch.startswith("HEAD"):
+                        info.current_branch = "HEAD"
+                    elif branch:
+                        info.current_branch = branch
+                info.has_uncommitted_changes = bool(entries.strip())
+
+            # The origin URL lives in .git/config; read the file instead of
+            # paying for a third subprocess
+            info.remote_url = self._read_origin_url(git_dir)
 
-            # Get current commit hash
-            result = await self._run_git_command(
-                ["rev-parse", "HEAD"],
-                cwd=skill_dir,
-                check=False
-            )
-            if result.returncode == 0:
-                info.current_commit = result.stdout.strip()[:8]
+        except Exception as e:
+            logger.warning(f"Error getting git info for {skill_dir}: {e}")
+            return info
 
-            # Get commit message
-            result = await self._run_git_command(
-                ["log", "-1", "--pretty=%s"],
-                cwd=skill_dir,
-                check=False
-            )
-            if result.returncode == 0:
-                info.commit_message = result.stdout.strip()
+        # Re-stat after running: "git status" itself refreshes .git/index,
+        # so the pre-run key would already be stale
+        self._git_info_cache[skill_dir] = (self._git_info_cache_key(git_dir), info)
+        return info
 
-            # Get commit date
-            result = await self._run_git_command(
-                ["log", "-1", "--pretty=%ci"],
-                cwd=skill_dir,
-                check=False
-            )
-            if result.returncode == 0:
-                info.commit_date = result.stdout.strip()
+    async def get_git_info_many(
+        self,
+        skill_dirs: dict[str, Path],
+        concurrency: int = 8,
+    ) -> dict[str, GitInfo]:
+        """Get Git info for many skill directories concurrently.
 
-            # Check for uncommitted changes
-            result = await self._run_git_command(
-                ["status", "--porcelain"],
-                cwd=skill_dir,
-                check=False
-            )
-            if result.returncode == 0:
-                info.has_uncommitted_changes = bool(result.stdout.strip())
+        Listing callers should use this instead of awaiting get_git_info
+        per skill: the per-skill git processes overlap, bounded by the
+        semaphore so a large skills directory doesn't fork dozens of git
+        processes at once.
 
-        except Exception as e:
-            logger.warning(f"Error getting git info for {skill_dir}: {e}")
+        Args:
+            skill_dirs: Mapping of skill_name -> path (e.g. from scan_local_skills)
+            concurrency: Maximum number of skills queried at the same time
 
-        return info
+        Returns:
+            Mapping of skill_name -> GitInfo
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(name: str, path: Path) -> tuple[str, GitInfo]:
+            async with semaphore:
+                return name, await self.get_git_info(path)
+
+        results = await asyncio.gather(
+            *(bounded(name, path) for name, path in skill_dirs.items())
+        )
+        return dict(results)
 
     async def install_from_git(
         self,
@@ -291,17 +463,26 @@ class LocalSkillManager:
             )
 
         try:
-            # Clone the repository
+            # Clone trees only, without checkout: a repository that turns
+            # out not to be a skill is rejected after transferring
+            # kilobytes of metadata instead of its full working tree.
+            # Servers without partial-clone support ignore the filter and
+            # fall back to a normal shallow clone.
             result = await self._run_git_command(
-                ["clone", "--branch", branch, "--depth", "1", git_url, str(dest_dir)],
+                ["clone", "--branch", branch, "--depth", "1", "--no-tags",
+                 "--filter=blob:none", "--no-checkout", git_url, str(dest_dir)],
                 check=True
             )
 
-            # Verify SKILL.md exists
-            skill_md = dest_dir / "SKILL.md"
-            if not skill_md.exists():
+            # Verify SKILL.md exists in the tree before materializing files
+            result = await self._run_git_command(
+                ["cat-file", "-e", "HEAD:SKILL.md"],
+                cwd=dest_dir,
+                check=False
+            )
+            if result.returncode != 0:
                 # Clean up
-                shutil.rmtree(dest_dir)
+                await self._rmtree(dest_dir)
                 return InstallResult(
                     success=False,
                     skill_name=skill_name,
@@ -309,6 +490,14 @@ class LocalSkillManager:
                     error="Repository does not contain a SKILL.md file."
                 )
 
+            # Materialize the working tree (fetches the blobs on demand for
+            # partial clones)
+            await self._run_git_command(
+                ["checkout", "HEAD"],
+                cwd=dest_dir,
+                check=True
+            )
+
             logger.info(f"Successfully installed skill '{skill_name}' from {git_url}")
             return InstallResult(
                 success=True,
@@ -320,8 +509,8 @@ class LocalSkillManager:
         except subprocess.CalledProcessError as e:
             # Clean up on failure
             if dest_dir.exists():
-                shutil.rmtree(dest_dir)
-            error_msg = e.stderr if e.stderr else str(e)
+                await self._rmtree(dest_dir)
+            error_msg = _decode_git_output(e.stderr) or str(e)
             return InstallResult(
                 success=False,
                 skill_name=skill_name,
@@ -329,6 +518,45 @@ class LocalSkillManager:
                 error=f"Git clone failed: {error_msg}"
             )
 
+    async def install_many_from_git(
+        self,
+        specs: list[tuple[str, Optional[str], str]],
+        concurrency: int = 4,
+    ) -> list[InstallResult]:
+        """Install several skills from Git repositories concurrently.
+
+        Clones are network-bound, so running them in parallel (bounded by
+        the semaphore) makes bulk installs take roughly as long as the
+        slowest repository instead of the sum of all of them.
+
+        Args:
+            specs: List of (git_url, skill_name, branch) tuples; skill_name
+                may be None to derive it from the URL
+            concurrency: Maximum number of clones running at once
+
+        Returns:
+            List of InstallResult in the same order as specs
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(git_url: str, skill_name: Optional[str], branch: str) -> InstallResult:
+            async with semaphore:
+                try:
+                    return await self.install_from_git(git_url, skill_name, branch)
+                except Exception as e:
+                    logger.warning(f"Error installing skill from {git_url}: {e}")
+                    return InstallResult(
+                        success=False,
+                        skill_name=skill_name or "",
+                        local_path="",
+                        git_url=git_url,
+                        error=str(e),
+                    )
+
+        return list(await asyncio.gather(
+            *(bounded(url, name, branch) for url, name, branch in specs)
+        ))
+
     async def update_skill(self, skill_name: str) -> tuple[bool, str]:
         """Update a Git-managed skill by pulling latest changes.
 
@@ -342,13 +570,20 @@ class LocalSkillManager:
         if not skill_dir.exists():
             return False, f"Skill '{skill_name}' not found."
 
-        git_info = await self.get_git_info(skill_dir)
-        if not git_info.is_git_repo:
+        if not self._is_git_repo(skill_dir):
             return False, f"Skill '{skill_name}' is not a Git repository."
 
         try:
+            # Only the dirtiness bit is needed to decide on stashing, so
+            # ask for just that instead of the full get_git_info probe
+            status_result = await self._run_git_command(
+                ["status", "--porcelain"],
+                cwd=skill_dir,
+                check=False
+            )
+
             # Stash any local changes
-            if git_info.has_uncommitted_changes:
+            if status_result.returncode == 0 and status_result.stdout.strip():
                 await self._run_git_command(
                     ["stash", "push", "-m", "auto-stash before update"],
                     cwd=skill_dir,
@@ -362,12 +597,13 @@ class LocalSkillManager:
                 check=True
             )
 
-            message = result.stdout.strip() if result.stdout else "Updated successfully"
+            message = _decode_git_output(result.stdout).strip() or "Updated successfully"
+            self._invalidate_git_info(skill_dir)
             logger.info(f"Updated skill '{skill_name}': {message}")
             return True, message
 
         except subprocess.CalledProcessError as e:
-            error_msg = e.stderr if e.stderr else str(e)
+            error_msg = _decode_git_output(e.stderr) or str(e)
             return False, f"Update failed: {error_msg}"
 
     async def get_version_history(
@@ -385,11 +621,7 @@ class LocalSkillManager:
             List of SkillVersion objects
         """
         skill_dir = self.skills_dir / skill_name
-        if not skill_dir.exists():
-            return []
-
-        git_info = await self.get_git_info(skill_dir)
-        if not git_info.is_git_repo:
+        if not skill_dir.exists() or not self._is_git_repo(skill_dir):
             return []
 
         try:
@@ -400,21 +632,19 @@ class LocalSkillManager:
                 check=True
             )
 
+            # Match directly on the raw bytes instead of decoding the
+            # whole log and building split lists per line. git log walks
+            # back from HEAD, so the first entry is the current version —
+            # no separate get_git_info probe needed.
             versions = []
-            for line in result.stdout.strip().split('\n'):
-                if not line:
-                    continue
-                parts = line.split('|', 3)
-                if len(parts) >= 4:
-                    commit_hash = parts[0]
-                    versions.append(SkillVersion(
-                        commit_hash=commit_hash,
-                        message=parts[1],
-                        author=parts[2],
-                        date=parts[3],
-                        is_current=(commit_hash == git_info.current_commit or
-                                    commit_hash.startswith(git_info.current_commit or ""))
-                    ))
+            for match in _GIT_LOG_LINE_RE.finditer(result.stdout or b""):
+                versions.append(SkillVersion(
+                    commit_hash=match.group(1).decode("ascii"),
+                    message=_decode_git_output(match.group(2)),
+                    author=_decode_git_output(match.group(3)),
+                    date=match.group(4).decode("ascii", errors="replace"),
+                    is_current=not versions
+                ))
 
             return versions
 
@@ -439,8 +669,7 @@ class LocalSkillManager:
         if not skill_dir.exists():
             return False, f"Skill '{skill_name}' not found."
 
-        git_info = await self.get_git_info(skill_dir)
-        if not git_info.is_git_repo:
+        if not self._is_git_repo(skill_dir):
             return False, f"Skill '{skill_name}' is not a Git repository."
 
         try:
@@ -451,54 +680,104 @@ class LocalSkillManager:
                 check=True
             )
 
+            self._invalidate_git_info(skill_dir)
             logger.info(f"Rolled back skill '{skill_name}' to commit {commit_hash[:8]}")
             return True, f"Rolled back to commit {commit_hash[:8]}"
 
         except subprocess.CalledProcessError as e:
-            error_msg = e.stderr if e.stderr else str(e)
+            error_msg = _decode_git_output(e.stderr) or str(e)
             return False, f"Rollback failed: {error_msg}"
 
     def extract_zip_to_directory(self, zip_path: Path, skill_name: str) -> Path:
         """Extract ZIP file to skills directory."""
         self._ensure_dirs()
-        dest_dir = self.skills_dir / skill_name
-
-        # Remove existing directory if exists
-        if dest_dir.exists():
-            shutil.rmtree(dest_dir)
 
-        # Extract ZIP
         with zipfile.ZipFile(zip_path, 'r') as zf:
-            namelist = zf.namelist()
+            dest_dir, trash_dir = self._extract_zip_atomic(zf, skill_name)
 
-            # Detect if there's a single root folder
-            root_folders = set()
-            for name in namelist:
-                parts = name.split('/')
-                if len(parts) > 1 and parts[0]:
-                    root_folders.add(parts[0])
-
-            if len(root_folders) == 1:
-                # ZIP has a single root folder, extract and rename
-                root_folder = list(root_folders)[0]
-                temp_dir = self.skills_dir / f"_temp_{skill_name}"
-                zf.extractall(temp_dir)
-
-                # Move the root folder to the correct name
-                extracted_dir = temp_dir / root_folder
-                if extracted_dir.exists():
-                    shutil.move(str(extracted_dir), str(dest_dir))
-                    shutil.rmtree(temp_dir)
-                else:
-                    shutil.move(str(temp_dir), str(dest_dir))
-            else:
-                # ZIP contains files directly
-                dest_dir.mkdir(parents=True, exist_ok=True)
-                zf.extractall(dest_dir)
+        if trash_dir is not None:
+            shutil.rmtree(trash_dir, ignore_errors=True)
 
         logger.info(f"Extracted ZIP to: {dest_dir}")
         return dest_dir
 
+    def _extract_zip_atomic(
+        self,
+        zf: zipfile.ZipFile,
+        skill_name: str
+    ) -> tuple[Path, Optional[Path]]:
+        """Extract an archive into a staging directory, then swap it in.
+
+        The previous rmtree-then-extract order left the skill missing for
+        the whole extraction (and gone for good if it failed halfway).
+        Extracting next to the destination and renaming keeps the visible
+        directory intact until the new tree is complete; both renames are
+        atomic on the same filesystem. Dot-prefixed staging/trash names
+        are invisible to scan_local_skills.
+
+        Returns:
+            Tuple of (dest_dir, trash_dir); trash_dir is the displaced
+            previous install for the caller to delete, or None
+        """
+        dest_dir = self.skills_dir / skill_name
+        staging_dir = self.skills_dir / f".staging.{skill_name}.{uuid4().hex}"
+        try:
+            self._extract_zip_archive(zf, staging_dir)
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        trash_dir = None
+        if dest_dir.exists():
+            trash_dir = self.skills_dir / f".trash.{skill_name}.{uuid4().hex}"
+            os.replace(dest_dir, trash_dir)
+        os.replace(staging_dir, dest_dir)
+        self._invalidate_git_info(dest_dir)
+        return dest_dir, trash_dir
+
+    @staticmethod
+    def _extract_zip_archive(zf: zipfile.ZipFile, dest_dir: Path) -> None:
+        """Extract an open ZIP archive into dest_dir in a single pass.
+
+        Archives that wrap everything in a single root folder have that
+        prefix stripped while writing, instead of extracting to a temp
+        tree and moving it afterwards (which copied every file twice).
+        """
+        namelist = zf.namelist()
+
+        # Detect if there's a single root folder ("." / ".." are path
+        # tricks, not folders)
+        root_folders = set()
+        for name in namelist:
+            parts = name.split('/')
+            if len(parts) > 1 and parts[0] and parts[0] not in ('.', '..'):
+                root_folders.add(parts[0])
+
+        prefix = f"{root_folders.pop()}/" if len(root_folders) == 1 else ""
+
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        dest_root = dest_dir.resolve()
+        for info in zf.infolist():
+            name = info.filename
+            if prefix:
+                if not name.startswith(prefix):
+                    continue
+                name = name[len(prefix):]
+            if not name:
+                continue
+            target = dest_dir / name
+            # Don't let "../" entries escape the skill directory
+            if not target.resolve().is_relative_to(dest_root):
+                logger.warning(f"Skipping ZIP entry outside destination: {info.filename}")
+                continue
+            if info.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                # 1 MB copy buffer beats zipfile's 8 KB default for big files
+                with zf.open(info) as src, open(target, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, length=1 << 20)
+
     async def upload_skill_from_zip(
         self,
         zip_content: bytes,
@@ -513,43 +792,42 @@ class LocalSkillManager:
         Returns:
             dict with skill metadata
         """
-        import tempfile
-
         self._ensure_dirs()
 
-        # Save ZIP to temp file
-        with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tmp:
-            tmp.write(zip_content)
-            tmp_path = Path(tmp.name)
-
-        try:
+        # The payload is already in memory, so open the archive directly:
+        # no temp-file round-trip, and validation and extraction share one
+        # open handle (one central-directory parse)
+        with zipfile.ZipFile(io.BytesIO(zip_content), 'r') as zf:
             # Validate ZIP has SKILL.md
-            with zipfile.ZipFile(tmp_path, 'r') as zf:
-                namelist = zf.namelist()
-                has_skill_md = any(
-                    name.endswith('SKILL.md') or name == 'SKILL.md'
-                    for name in namelist
-                )
-                if not has_skill_md:
-                    raise ValueError("ZIP must contain a SKILL.md file")
-
-            # Extract to local directory
-            skill_dir = self.extract_zip_to_directory(tmp_path, skill_name)
+            namelist = zf.namelist()
+            has_skill_md = any(
+                name.endswith('SKILL.md') or name == 'SKILL.md'
+                for name in namelist
+            )
+            if not has_skill_md:
+                raise ValueError("ZIP must contain a SKILL.md file")
+
+            # Extract to local directory off the event loop; the staged
+            # swap keeps the old install visible until the new one is
+            # complete, and the displaced tree is removed afterwards
+            skill_dir, trash_dir = await asyncio.to_thread(
+                self._extract_zip_atomic, zf, skill_name
+            )
+            logger.info(f"Extracted ZIP to: {skill_dir}")
 
-            # Extract metadata
-            metadata = self.extract_skill_metadata(skill_dir)
+        if trash_dir is not None:
+            await self._rmtree(trash_dir)
 
-            return {
-                "name": metadata.name,
-                "description": metadata.description,
-                "version": metadata.version,
-                "local_path": str(skill_dir),
-                "folder_name": skill_name,
-            }
+        # Extract metadata
+        metadata = self.extract_skill_metadata(skill_dir)
 
-        finally:
-            # Cleanup temp file
-            tmp_path.unlink(missing_ok=True)
+        return {
+            "name": metadata.name,
+            "description": metadata.description,
+            "version": metadata.version,
+            "local_path": str(skill_dir),
+            "folder_name": skill_name,
+        }
 
     async def delete_skill(self, skill_name: str) -> bool:
         """Delete a skill from local storage.
@@ -562,7 +840,8 @@ class LocalSkillManager:
         """
         skill_dir = self.skills_dir / skill_name
         if skill_dir.exists():
-            shutil.rmtree(skill_dir)
+            await self._rmtree(skill_dir)
+            self._invalidate_git_info(skill_dir)
             logger.info(f"Deleted local skill directory: {skill_dir}")
             return True
         return False
@@ -95,6 +95,33 @@ class SessionManager:
         self._cache[session_id] = session_info
         return session_info
 
+    async def touch_session(
+        self,
+        session_id: str,
+        agent_id: str,
+        title: str = "New Chat",
+        user_id: Optional[str] = None,
+        work_dir: Optional[str] = None,
+    ) -> SessionInfo:
+        """Store session information, skipping the DB upsert when nothing changed.
+
+        Resumed conversation turns call this on the latency-critical path
+        before SDK dispatch. If the session is already in the in-process
+        cache and neither title nor work_dir would change, the DB round-trip
+        is skipped entirely (last_accessed then refreshes on the next real
+        write). Unknown sessions fall through to store_session.
+        """
+        cached = self._cache.get(session_id)
+        if (
+            cached is not None
+            and cached.title == title
+            and (work_dir is None or cached.work_dir == work_dir)
+        ):
+            return cached
+        return await self.store_session(
+            session_id, agent_id, title, user_id=user_id, work_dir=work_dir
+        )
+
     async def session_exists(self, session_id: str) -> bool:
         """Check if session exists."""
         if session_id in self._cache:
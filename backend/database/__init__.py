@@ -63,6 +63,15 @@ async def initialize_database() -> None:
             await _db_instance.initialize()
 
 
+async def close_database() -> None:
+    """Close the database on application shutdown.
+
+    Releases the SQLite connection pool; no-op for DynamoDB.
+    """
+    if _db_instance is not None and hasattr(_db_instance, "close"):
+        await _db_instance.close()
+
+
 # Convenience alias for direct access
 # Note: For SQLite, you must call initialize_database() first
 db = get_database()
@@ -72,5 +81,6 @@ __all__ = [
     "BaseTable",
     "get_database",
     "initialize_database",
+    "close_database",
     "db",
 ]
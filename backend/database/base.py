@@ -35,10 +35,27 @@ class BaseTable(ABC, Generic[T]):
         """Update an item."""
         pass
 
+    async def put_many(self, items: list[T]) -> list[T]:
+        """Insert or update several items.
+
+        Default implementation puts sequentially; backends override with a
+        true batch write where the engine supports one.
+        """
+        for item in items:
+            await self.put(item)
+        return items
+
     async def list_by_session(self, session_id: str) -> list[T]:
         """List items by session ID. Override in subclasses that support this."""
         raise NotImplementedError("list_by_session not implemented for this table")
 
+    async def append_blocks(self, item_id: str, blocks: list[dict]) -> None:
+        """Append content blocks to an existing item's content array.
+
+        Override in subclasses that support this (messages tables).
+        """
+        raise NotImplementedError("append_blocks not implemented for this table")
+
 
 class BaseDatabase(ABC):
     """Abstract base class for database clients."""
@@ -152,6 +152,42 @@ class DynamoDBMessagesTable(DynamoDBTable[T], Generic[T]):
         await table.put_item(Item=item)
         return item
 
+    async def put_many(self, items: list[T]) -> list[T]:
+        """Insert a batch of messages via the DynamoDB batch writer."""
+        if not items:
+            return items
+
+        now = datetime.now().isoformat()
+        expires_at = int(time.time()) + self.TTL_SECONDS
+        for item in items:
+            if "id" not in item:
+                item["id"] = str(uuid4())
+            if "created_at" not in item:
+                item["created_at"] = now
+            item["updated_at"] = now
+            item["expires_at"] = expires_at
+
+        table = await self._get_table()
+        async with table.batch_writer() as batch:
+            for item in items:
+                await batch.put_item(Item=item)
+        return items
+
+    async def append_blocks(self, item_id: str, blocks: list[dict]) -> None:
+        """Append content blocks to a message's content list in place."""
+        if not blocks:
+            return
+
+        table = await self._get_table()
+        await table.update_item(
+            Key={"id": item_id},
+            UpdateExpression="SET content = list_append(content, :blocks), updated_at = :now",
+            ExpressionAttributeValues={
+                ":blocks": blocks,
+                ":now": datetime.now().isoformat(),
+            },
+        )
+
     async def list_by_session(self, session_id: str) -> list[T]:
         """List all messages for a session, ordered by timestamp."""
         table = await self._get_table()
@@ -249,13 +285,14 @@ class DynamoDBDatabase(BaseDatabase):
 
     def __init__(self):
         self._session = aioboto3.Session()
-        self._agents = DynamoDBTable[dict](settings.dynamodb_agents_table, self._session)
-        self._skills = DynamoDBTable[dict](settings.dynamodb_skills_table, self._session)
-        self._mcp_servers = DynamoDBTable[dict](settings.dynamodb_mcp_table, self._session)
-        self._sessions = DynamoDBTable[dict](settings.dynamodb_sessions_table, self._session)
-        self._messages = DynamoDBMessagesTable[dict](settings.dynamodb_messages_table, self._session)
-        self._users = DynamoDBTable[dict](settings.dynamodb_users_table, self._session)
-        self._skill_versions = DynamoDBSkillVersionsTable[dict](settings.dynamodb_skill_versions_table, self._session)
+        tables = settings.dynamodb_tables
+        self._agents = DynamoDBTable[dict](tables.agents, self._session)
+        self._skills = DynamoDBTable[dict](tables.skills, self._session)
+        self._mcp_servers = DynamoDBTable[dict](tables.mcp, self._session)
+        self._sessions = DynamoDBTable[dict](tables.sessions, self._session)
+        self._messages = DynamoDBMessagesTable[dict](tables.messages, self._session)
+        self._users = DynamoDBTable[dict](tables.users, self._session)
+        self._skill_versions = DynamoDBSkillVersionsTable[dict](tables.skill_versions, self._session)
 
     @property
     def agents(self) -> DynamoDBTable:
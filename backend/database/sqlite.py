@@ -2,9 +2,11 @@
 from __future__ import annotations
 
 import aiosqlite
+import asyncio
 import json
 import logging
 import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, TypeVar, Generic
@@ -16,22 +18,107 @@ logger = logging.getLogger(__name__)
 
 T = TypeVar("T", bound=dict)
 
+# Prebuilt compact encoder for the hot serialization path (message content
+# can be multi-MB of tool output). Skips per-call encoder setup, drops
+# separator whitespace, and ensure_ascii=False keeps non-ASCII text as-is
+# instead of \uXXXX-escaping every character.
+_json_encode_compact = json.JSONEncoder(
+    separators=(",", ":"), ensure_ascii=False
+).encode
+
+
+class SQLiteConnectionPool:
+    """Small pool of persistent aiosqlite connections.
+
+    Opening an aiosqlite connection spawns a worker thread and opens the
+    database file, which dominates latency for small queries when paid per
+    call. The pool keeps up to max_size connections alive in WAL mode (so
+    readers don't block the writer) and hands them out via an async context
+    manager, waiting for a free one when all are borrowed.
+    """
+
+    def __init__(self, db_path: Path, max_size: int = 4):
+        self._db_path = db_path
+        self._max_size = max_size
+        self._idle: asyncio.LifoQueue = asyncio.LifoQueue()
+        self._opened = 0
+
+    async def _open(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(str(self._db_path))
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        await conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection; returned to the pool on exit."""
+        try:
+            conn = self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            if self._opened < self._max_size:
+                self._opened += 1
+                try:
+                    conn = await self._open()
+                except BaseException:
+                    self._opened -= 1
+                    raise
+            else:
+                conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            # Leave no transaction or row_factory behind for the next
+            # borrower; a connection that fails cleanup is closed instead
+            # of returned.
+            try:
+                if conn.in_transaction:
+                    await conn.rollback()
+                conn.row_factory = None
+            except Exception:
+                self._opened -= 1
+                try:
+                    await conn.close()
+                except Exception:
+                    pass
+            else:
+                self._idle.put_nowait(conn)
+
+    async def close(self) -> None:
+        """Close all idle connections (call on application shutdown)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            self._opened -= 1
+            try:
+                await conn.close()
+            except Exception:
+                pass
+
 
 class SQLiteTable(BaseTable[T], Generic[T]):
     """SQLite table implementation of BaseTable interface."""
 
-    def __init__(self, table_name: str, db_path: Path):
+    def __init__(self, table_name: str, db_path: Path, pool: Optional[SQLiteConnectionPool] = None):
         self.table_name = table_name
         self.db_path = db_path
+        self._pool = pool
 
-    def _get_connection(self) -> aiosqlite.Connection:
+    def _get_connection(self):
         """Get an async SQLite connection context manager.
 
+        Borrows from the shared pool when one is attached; otherwise opens
+        a fresh connection (pre-pool behavior).
+
         Usage:
             async with self._get_connection() as conn:
                 conn.row_factory = aiosqlite.Row
                 # use conn
         """
+        if self._pool is not None:
+            return self._pool.connection()
         return aiosqlite.connect(str(self.db_path))
 
     def _row_to_dict(self, row: aiosqlite.Row) -> dict:
@@ -51,7 +138,7 @@ class SQLiteTable(BaseTable[T], Generic[T]):
     def _serialize_value(self, value) -> str | int | float | None:
         """Serialize a value for SQLite storage."""
         if isinstance(value, (list, dict)):
-            return json.dumps(value)
+            return _json_encode_compact(value)
         if isinstance(value, datetime):
             return value.isoformat()
         if isinstance(value, bool):
@@ -139,21 +226,22 @@ class SQLiteTable(BaseTable[T], Generic[T]):
         updates["updated_at"] = datetime.now().isoformat()
 
         async with self._get_connection() as conn:
+            conn.row_factory = aiosqlite.Row
             columns = list(updates.keys())
             set_clause = ", ".join(f"{col} = ?" for col in columns)
             values = [self._serialize_value(updates[col]) for col in columns]
             values.append(item_id)
 
-            cursor = await conn.execute(
-                f"UPDATE {self.table_name} SET {set_clause} WHERE id = ?",
+            # RETURNING folds the read-back into the update statement, so a
+            # patch costs one round-trip instead of UPDATE + SELECT
+            async with conn.execute(
+                f"UPDATE {self.table_name} SET {set_clause} WHERE id = ? RETURNING *",
                 values
-            )
+            ) as cursor:
+                row = await cursor.fetchone()
             await conn.commit()
 
-            if cursor.rowcount == 0:
-                return None
-
-        return await self.get(item_id)
+            return self._row_to_dict(row) if row else None
 
 
 class SQLiteMessagesTable(SQLiteTable[T], Generic[T]):
@@ -175,6 +263,70 @@ class SQLiteMessagesTable(SQLiteTable[T], Generic[T]):
 
         return await super().put(item)
 
+    async def put_many(self, items: list[T]) -> list[T]:
+        """Insert a batch of messages in one connection/commit.
+
+        Messages are always new rows (fresh UUIDs), so this skips the
+        per-item existence check in put and groups the inserts into a
+        single executemany per column shape, committing once.
+        """
+        if not items:
+            return items
+
+        now = datetime.now().isoformat()
+        expires_at = int(time.time()) + self.TTL_SECONDS
+        for item in items:
+            if "id" not in item:
+                item["id"] = str(uuid4())
+            if "created_at" not in item:
+                item["created_at"] = now
+            item["updated_at"] = now
+            item["expires_at"] = expires_at
+
+        # Group by column tuple so each executemany has a fixed shape
+        groups: dict[tuple, list[list]] = {}
+        for item in items:
+            columns = tuple(item.keys())
+            groups.setdefault(columns, []).append(
+                [self._serialize_value(item[col]) for col in columns]
+            )
+
+        async with self._get_connection() as conn:
+            for columns, rows in groups.items():
+                placeholders = ", ".join("?" for _ in columns)
+                await conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table_name} ({', '.join(columns)}) VALUES ({placeholders})",
+                    rows
+                )
+            await conn.commit()
+        return items
+
+    async def append_blocks(self, item_id: str, blocks: list[dict]) -> None:
+        """Append content blocks to a message's JSON content array in place.
+
+        Uses json_insert with '$[#]' paths so the existing array is extended
+        inside SQLite without reading the row back first.
+        """
+        if not blocks:
+            return
+
+        # Chain one json_insert path/value pair per block; '$[#]' targets the
+        # end of the array after each preceding insert.
+        set_expr = "content"
+        params: list[str] = []
+        for block in blocks:
+            set_expr = f"json_insert({set_expr}, '$[#]', json(?))"
+            params.append(_json_encode_compact(block))
+        params.append(datetime.now().isoformat())
+        params.append(item_id)
+
+        async with self._get_connection() as conn:
+            await conn.execute(
+                f"UPDATE {self.table_name} SET content = {set_expr}, updated_at = ? WHERE id = ?",
+                params
+            )
+            await conn.commit()
+
     async def list_by_session(self, session_id: str) -> list[T]:
         """List all messages for a session, ordered by timestamp."""
         async with self._get_connection() as conn:
@@ -559,18 +711,21 @@ class SQLiteDatabase(BaseDatabase):
         self.db_path = db_path
         self._initialized = False
 
+        # One shared connection pool for all tables on this file
+        self._pool = SQLiteConnectionPool(self.db_path)
+
         # Initialize tables
-        self._agents = SQLiteTable[dict]("agents", self.db_path)
-        self._skills = SQLiteTable[dict]("skills", self.db_path)
-        self._mcp_servers = SQLiteTable[dict]("mcp_servers", self.db_path)
-        self._sessions = SQLiteTable[dict]("sessions", self.db_path)
-        self._messages = SQLiteMessagesTable[dict]("messages", self.db_path)
-        self._users = SQLiteTable[dict]("users", self.db_path)
-        self._skill_versions = SQLiteSkillVersionsTable[dict]("skill_versions", self.db_path)
-        self._app_settings = SQLiteTable[dict]("app_settings", self.db_path)
-        self._marketplaces = SQLiteTable[dict]("marketplaces", self.db_path)
-        self._plugins = SQLitePluginsTable[dict]("plugins", self.db_path)
-        self._permission_requests = SQLiteTable[dict]("permission_requests", self.db_path)
+        self._agents = SQLiteTable[dict]("agents", self.db_path, self._pool)
+        self._skills = SQLiteTable[dict]("skills", self.db_path, self._pool)
+        self._mcp_servers = SQLiteTable[dict]("mcp_servers", self.db_path, self._pool)
+        self._sessions = SQLiteTable[dict]("sessions", self.db_path, self._pool)
+        self._messages = SQLiteMessagesTable[dict]("messages", self.db_path, self._pool)
+        self._users = SQLiteTable[dict]("users", self.db_path, self._pool)
+        self._skill_versions = SQLiteSkillVersionsTable[dict]("skill_versions", self.db_path, self._pool)
+        self._app_settings = SQLiteTable[dict]("app_settings", self.db_path, self._pool)
+        self._marketplaces = SQLiteTable[dict]("marketplaces", self.db_path, self._pool)
+        self._plugins = SQLitePluginsTable[dict]("plugins", self.db_path, self._pool)
+        self._permission_requests = SQLiteTable[dict]("permission_requests", self.db_path, self._pool)
 
     async def initialize(self) -> None:
         """Initialize database schema."""
@@ -586,6 +741,10 @@ class SQLiteDatabase(BaseDatabase):
 
         self._initialized = True
 
+    async def close(self) -> None:
+        """Release pooled connections on shutdown."""
+        await self._pool.close()
+
     async def _run_migrations(self, conn: aiosqlite.Connection) -> None:
         """Run database migrations for existing databases.
 
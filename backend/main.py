@@ -13,7 +13,7 @@ from config import settings
 from routers import agents_router, skills_router, mcp_router, chat_router, auth_router, workspace_router, settings_router, plugins_router
 from middleware.error_handler import setup_error_handlers
 from middleware.rate_limit import limiter
-from database import initialize_database
+from database import initialize_database, close_database
 
 
 def get_log_file_path() -> Path:
@@ -77,6 +77,7 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown
     logger.info("Shutting down...")
+    await close_database()
 
 
 # Create FastAPI application
@@ -94,15 +95,15 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 # Configure CORS
 # In production, you should set CORS_ORIGINS environment variable
 # to restrict origins to your domain(s)
-cors_origins = settings.cors_origins
+cors_origins = settings.cors_origins_set
 if settings.debug:
     # In debug mode, also allow common development origins
-    cors_origins = list(set(cors_origins + [
+    cors_origins = cors_origins | {
         "http://localhost:5173",  # Vite default
         "http://localhost:3000",  # CRA default
         "http://127.0.0.1:5173",
         "http://127.0.0.1:3000",
-    ]))
+    }
 
 app.add_middleware(
     CORSMiddleware,
@@ -10,6 +10,7 @@ from core.exceptions import (
     AgentNotFoundException,
     ValidationException,
 )
+from core.agent_manager import agent_manager
 from core.workspace_manager import workspace_manager
 
 
@@ -173,6 +174,7 @@ async def update_agent(agent_id: str, request: AgentUpdateRequest):
         logger.info(f"Global User Mode enabled for agent {agent_id} - setting allow_all_skills=True, clearing skill_ids")
 
     agent = await db.agents.update(agent_id, updates)
+    agent_manager.invalidate_agent_config(agent_id)
 
     # Check if skill_ids or allow_all_skills changed - if so, rebuild workspace
     skill_ids_changed = "skill_ids" in updates
@@ -206,6 +208,7 @@ async def delete_agent(agent_id: str):
         )
 
     deleted = await db.agents.delete(agent_id)
+    agent_manager.invalidate_agent_config(agent_id)
     if not deleted:
         raise AgentNotFoundException(
             detail=f"Agent with ID '{agent_id}' does not exist",
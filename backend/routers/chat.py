@@ -94,11 +94,32 @@ async def sse_with_heartbeat(
                 if item_type == "done":
                     # Generator finished, exit loop
                     break
-                elif item_type == "message":
-                    yield f"data: {json.dumps(item)}\n\n"
                 elif item_type == "error":
                     raise item
 
+                # Coalesce any messages that have already queued up behind
+                # this one into a single transport write. Each event keeps
+                # its own "data:" framing so the client sees an identical
+                # stream; only the per-chunk ASGI/send overhead is
+                # amortized. Nothing blocks here, so bursty token streams
+                # batch naturally without adding latency to sparse ones.
+                parts = [f"data: {json.dumps(item)}\n\n"]
+                pending = None
+                while pending is None:
+                    try:
+                        next_type, next_item = message_queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
+                    if next_type == "message":
+                        parts.append(f"data: {json.dumps(next_item)}\n\n")
+                    else:
+                        pending = (next_type, next_item)
+                yield "".join(parts)
+                if pending is not None:
+                    if pending[0] == "error":
+                        raise pending[1]
+                    break  # "done"
+
             except asyncio.TimeoutError:
                 # No message received within heartbeat interval, send heartbeat
                 if not generator_done:
@@ -2,6 +2,7 @@
 from fastapi import APIRouter
 from schemas.mcp import MCPCreateRequest, MCPUpdateRequest, MCPResponse
 from database import db
+from core.agent_manager import invalidate_resolution_cache
 from core.exceptions import (
     MCPServerNotFoundException,
     ValidationException,
@@ -68,6 +69,7 @@ async def create_mcp_server(request: MCPCreateRequest):
         "version": "v1.0.0",
     }
     server = await db.mcp_servers.put(server_data)
+    invalidate_resolution_cache()
     return server
 
 
@@ -113,6 +115,7 @@ async def update_mcp_server(mcp_id: str, request: MCPUpdateRequest):
             updates["endpoint"] = url.replace("http://", "").replace("https://", "")
 
     server = await db.mcp_servers.update(mcp_id, updates)
+    invalidate_resolution_cache()
     return server
 
 
@@ -125,3 +128,4 @@ async def delete_mcp_server(mcp_id: str):
             detail=f"MCP server with ID '{mcp_id}' does not exist",
             suggested_action="Please check the MCP server ID and try again"
         )
+    invalidate_resolution_cache()
@@ -15,6 +15,7 @@ from schemas.marketplace import (
 )
 from database import db
 from core.plugin_manager import plugin_manager
+from core.agent_manager import invalidate_resolution_cache
 from core.exceptions import (
     NotFoundException,
     ValidationException,
@@ -265,6 +266,8 @@ async def install_plugin(request: PluginInstallRequest):
         skills_dir=plugin_manager.skills_dir,
     )
 
+    invalidate_resolution_cache()
+
     return _plugin_to_response(plugin, marketplace["name"])
 
 
@@ -296,6 +299,7 @@ async def uninstall_plugin(plugin_id: str):
 
     # Delete from database
     await db.plugins.delete(plugin_id)
+    invalidate_resolution_cache()
 
     return {
         "plugin_id": plugin_id,
@@ -316,6 +320,7 @@ async def disable_plugin(plugin_id: str):
         )
 
     await db.plugins.update(plugin_id, {"status": "disabled"})
+    invalidate_resolution_cache()
     return {"status": "disabled", "plugin_id": plugin_id}
 
 
@@ -329,6 +334,7 @@ async def enable_plugin(plugin_id: str):
         )
 
     await db.plugins.update(plugin_id, {"status": "installed"})
+    invalidate_resolution_cache()
     return {"status": "installed", "plugin_id": plugin_id}
 
 
@@ -1,6 +1,8 @@
 """Settings API endpoints."""
+import asyncio
 import logging
 from datetime import datetime
+from typing import Optional
 from fastapi import APIRouter
 
 from schemas.settings import APIConfigurationRequest, APIConfigurationResponse
@@ -12,6 +14,19 @@ router = APIRouter()
 
 DEFAULT_SETTINGS_ID = "default"
 
+# Cached API settings snapshot. Settings change at human timescales but are
+# read on every agent start, so the DB round-trip is paid once and then
+# served from module state until the PUT route invalidates it. The lock
+# single-flights concurrent cache misses into one DB query.
+_api_settings_cache: Optional[dict] = None
+_api_settings_lock = asyncio.Lock()
+
+
+def invalidate_api_settings_cache() -> None:
+    """Drop the cached API settings snapshot after a settings write."""
+    global _api_settings_cache
+    _api_settings_cache = None
+
 
 @router.get("", response_model=APIConfigurationResponse)
 async def get_api_configuration():
@@ -104,6 +119,7 @@ async def update_api_configuration(request: APIConfigurationRequest):
 
     # Save settings
     await db.app_settings.put(settings)
+    invalidate_api_settings_cache()
 
     logger.info(f"API configuration updated: use_bedrock={settings.get('use_bedrock')}, auth_type={settings.get('bedrock_auth_type')}")
 
@@ -122,20 +138,34 @@ async def get_api_settings() -> dict:
     """Get raw API settings for internal use.
 
     This returns the full settings including secrets for use by agent_manager.
+    The snapshot is cached in module state; update_api_configuration
+    invalidates it on write.
     """
-    settings = await db.app_settings.get(DEFAULT_SETTINGS_ID)
-
-    if not settings:
-        return {
-            "anthropic_api_key": "",
-            "anthropic_base_url": None,
-            "use_bedrock": False,
-            "bedrock_auth_type": "credentials",
-            "aws_access_key_id": "",
-            "aws_secret_access_key": "",
-            "aws_session_token": None,
-            "aws_bearer_token": "",
-            "aws_region": "us-east-1",
-        }
-
-    return settings
+    global _api_settings_cache
+
+    cached = _api_settings_cache
+    if cached is not None:
+        return cached
+
+    async with _api_settings_lock:
+        # Another waiter may have populated the cache while we queued
+        if _api_settings_cache is not None:
+            return _api_settings_cache
+
+        settings = await db.app_settings.get(DEFAULT_SETTINGS_ID)
+
+        if not settings:
+            settings = {
+                "anthropic_api_key": "",
+                "anthropic_base_url": None,
+                "use_bedrock": False,
+                "bedrock_auth_type": "credentials",
+                "aws_access_key_id": "",
+                "aws_secret_access_key": "",
+                "aws_session_token": None,
+                "aws_bearer_token": "",
+                "aws_region": "us-east-1",
+            }
+
+        _api_settings_cache = settings
+        return settings